@@ -9,6 +9,17 @@ from .workflow import *
 from .datagen import *
 from .runner import *
 from .verifier import *
+from .memory import *
+from .gcmonitor import *
+from .driver import *
+from .fitting import *
+from .decimate import *
 from .extractor import *
 from .viewer import *
+from .live import *
+from .profiling import *
+from .report import *
+from .compare import *
+from .events import *
+from .suite import *
 from .expworkflow import *
@@ -0,0 +1,9 @@
+"""Allow running frexp as "python -m frexp"."""
+
+
+import sys
+
+from frexp.cli import main
+
+
+sys.exit(main())
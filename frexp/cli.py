@@ -0,0 +1,175 @@
+"""Command-line entry point.
+
+For example,
+
+    frexp mypkg.exps.SortWorkflow -p benchmark extract view --prog qsort
+
+re-benchmarks prog qsort only, merges its new datapoints into the
+existing results, and re-extracts and re-plots.
+"""
+
+
+__all__ = [
+    'load_workflow_class',
+    'main',
+]
+
+
+import sys
+import os
+import argparse
+import importlib
+import cProfile
+import pstats
+from functools import partial
+
+from frexp.suite import Suite
+from frexp.events import JSONLinesSink
+
+
+phases = ['generate', 'benchmark', 'verify', 'extract', 'view',
+          'profile_report', 'cleanup']
+default_phases = ['generate', 'benchmark', 'extract', 'view']
+
+
+def load_workflow_class(path):
+    """Import a class given as 'package.module.Class' or
+    'package.module:Class'.
+    """
+    if ':' in path:
+        modname, _, clsname = path.partition(':')
+    else:
+        modname, _, clsname = path.rpartition('.')
+    if not modname:
+        raise ValueError('Expected a dotted path to a workflow class, '
+                         'got ' + repr(path))
+    module = importlib.import_module(modname)
+    return getattr(module, clsname)
+
+
+def parse_x(s):
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog='frexp',
+        description='Run phases of one or more experiment workflows.')
+    parser.add_argument('workflows', nargs='+', metavar='WORKFLOW',
+                        help='dotted path of an ExpWorkflow subclass')
+    parser.add_argument('-p', '--phase', nargs='+', choices=phases,
+                        default=default_phases, dest='phases',
+                        help='phases to run, in the order given '
+                             '(default: {})'.format(
+                             ' '.join(default_phases)))
+    parser.add_argument('--prefix',
+                        help='file prefix, overriding the workflow\'s own '
+                             '(only with a single workflow)')
+    parser.add_argument('--prog', nargs='+', dest='progs',
+                        help='only benchmark these progs')
+    parser.add_argument('--dsid', nargs='+', dest='dsids',
+                        help='only benchmark these datasets')
+    parser.add_argument('--xmin', type=parse_x,
+                        help='only benchmark datasets with x >= XMIN')
+    parser.add_argument('--xmax', type=parse_x,
+                        help='only benchmark datasets with x <= XMAX')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='number of concurrent workers for '
+                             'verification, bootstrapping, and for '
+                             'running several workflows')
+    parser.add_argument('--capture-profiles', action='store_true',
+                        help='profile each benchmarked trial in an extra '
+                             'untimed run (see phase profile_report)')
+    parser.add_argument('--events', metavar='FILE',
+                        help='append progress events to FILE as JSON '
+                             'lines')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile frexp itself (not the driver '
+                             'processes) and print the top functions '
+                             'by cumulative time')
+    parser.add_argument('--profile-lines', type=int, default=25,
+                        metavar='N',
+                        help='number of functions printed by --profile '
+                             '(default 25)')
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help='also save the raw profile to FILE')
+    return parser
+
+
+def configure(workflow, args):
+    """Apply command-line filters, parallelism, and event logging to a
+    workflow.
+    """
+    if args.progs is not None:
+        workflow.filter_progs = set(args.progs)
+    if args.dsids is not None:
+        workflow.filter_dsids = set(args.dsids)
+    if args.xmin is not None or args.xmax is not None:
+        workflow.filter_xrange = (args.xmin, args.xmax)
+    if args.capture_profiles:
+        workflow.profile_trials = True
+    if args.jobs is not None:
+        workflow.verifier.workers = args.jobs
+        workflow.extractor.bootstrap_workers = args.jobs
+    if args.events is not None:
+        workflow.event_sinks.append(JSONLinesSink(args.events))
+
+
+def run(workflows, args):
+    if len(workflows) > 1 and all(p in Suite.phases for p in args.phases):
+        # Workflows are rebuilt in the suite's worker processes, and
+        # need the same configuration there.
+        suite = Suite(workflows, workers=args.jobs,
+                      configure=partial(configure, args=args))
+        suite.run(args.phases)
+        return 1 if len(suite.failed) > 0 else 0
+    
+    for workflow in workflows:
+        for phase in args.phases:
+            getattr(workflow, phase)()
+    return 0
+
+
+def report_profile(profiler, args):
+    if args.profile_out is not None:
+        profiler.dump_stats(args.profile_out)
+    stats = pstats.Stats(profiler, stream=sys.stderr)
+    stats.sort_stats('cumulative').print_stats(args.profile_lines)
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    if args.prefix is not None and len(args.workflows) > 1:
+        parser.error('--prefix requires a single workflow')
+    
+    # Like "python -m", allow importing from the current directory.
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    
+    workflows = []
+    for path in args.workflows:
+        try:
+            cls = load_workflow_class(path)
+        except (ImportError, AttributeError, ValueError) as e:
+            parser.error('cannot load {}: {}'.format(path, e))
+        workflow = cls(args.prefix) if args.prefix is not None else cls()
+        configure(workflow, args)
+        workflows.append(workflow)
+    
+    profiler = None
+    if args.profile or args.profile_out is not None:
+        profiler = cProfile.Profile()
+    try:
+        if profiler is None:
+            return run(workflows, args)
+        return profiler.runcall(run, workflows, args)
+    finally:
+        for workflow in workflows:
+            workflow.close_event_sinks()
+        if profiler is not None:
+            report_profile(profiler, args)
+
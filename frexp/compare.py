@@ -0,0 +1,324 @@
+"""Statistical comparison of a candidate result set against a baseline."""
+
+
+__all__ = [
+    'mann_whitney_u',
+    'bootstrap_ratio_ci',
+    'Comparator',
+    'CompareWorkflow',
+]
+
+
+import pickle
+import math
+import sys
+
+import numpy as np
+
+from frexp.workflow import Task, Workflow
+from frexp.extractor import get_keyfunc, Extractor
+from frexp.viewer import Plotter
+
+
+def pad_cells(cells):
+    """Given a list of 1-d sequences, return a (len(cells) x max len)
+    float array padded with NaN, and the array of lengths.
+    """
+    lengths = np.array([len(c) for c in cells])
+    arr = np.full((len(cells), max(lengths, default=0)), np.nan)
+    for i, c in enumerate(cells):
+        arr[i, :len(c)] = c
+    return arr, lengths
+
+
+def mann_whitney_u(xs_cells, ys_cells):
+    """Two-sided Mann-Whitney U test for each pair of cells, computed
+    at once over all cells. Return arrays (u, p, rank_biserial), where
+    u counts pairs with x > y (ties counting one half), p uses the
+    normal approximation without tie correction, and rank_biserial is
+    the effect size 2u/(nx*ny) - 1, in [-1, 1].
+    """
+    nx = np.array([len(c) for c in xs_cells])
+    ny = np.array([len(c) for c in ys_cells])
+    xcell = np.repeat(np.arange(len(xs_cells)), nx)
+    ycell = np.repeat(np.arange(len(ys_cells)), ny)
+    xs = np.concatenate([np.asarray(c, dtype=float) for c in xs_cells]
+                        + [np.empty(0)])
+    ys = np.concatenate([np.asarray(c, dtype=float) for c in ys_cells]
+                        + [np.empty(0)])
+    # Replace values by their ranks among all values, so that a single
+    # sorted integer key (cell, rank) orders every cell's ys at once.
+    _values, ranks = np.unique(np.concatenate([xs, ys]),
+                               return_inverse=True)
+    ranks = ranks.reshape(-1)
+    stride = len(ranks) + 1
+    xkeys = xcell * stride + ranks[:len(xs)]
+    ykeys = np.sort(ycell * stride + ranks[len(xs):])
+    # For each x, count the ys of its cell below and equal to it.
+    below = (np.searchsorted(ykeys, xkeys, 'left') -
+             np.searchsorted(ykeys, xcell * stride, 'left'))
+    equal = (np.searchsorted(ykeys, xkeys, 'right') -
+             np.searchsorted(ykeys, xkeys, 'left'))
+    u = np.bincount(xcell, weights=below + 0.5 * equal,
+                    minlength=len(xs_cells))
+    
+    nn = (nx * ny).astype(float)
+    mu = nn / 2
+    sigma = np.sqrt(nn * (nx + ny + 1) / 12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(sigma > 0, (u - mu) / sigma, 0.0)
+        rank_biserial = np.where(nn > 0, 2 * u / nn - 1, 0.0)
+    p = np.array([math.erfc(abs(zi) / math.sqrt(2)) for zi in z])
+    return u, p, rank_biserial
+
+
+def bootstrap_ratio_ci(xs_cells, ys_cells, samples, confidence, seed):
+    """Bootstrap percentile confidence interval of mean(x) / mean(y)
+    for each pair of cells, resampling all cells at once. Return
+    arrays (ratio, lo, hi).
+    """
+    rng = np.random.default_rng(seed)
+    
+    def resampled_means(cells):
+        arr, n = pad_cells(cells)
+        # Draw indices uniformly below each cell's own length.
+        u = rng.random((len(cells), samples, arr.shape[1]))
+        idx = (u * n[:, None, None]).astype(int)
+        vals = np.take_along_axis(arr[:, None, :], idx, axis=2)
+        mask = np.arange(arr.shape[1])[None, None, :] < n[:, None, None]
+        return (np.where(mask, vals, 0).sum(axis=2) / n[:, None],
+                np.nanmean(arr, axis=1))
+    
+    x_means, x_mean = resampled_means(xs_cells)
+    y_means, y_mean = resampled_means(ys_cells)
+    ratios = x_means / y_means
+    alpha = (1 - confidence) / 2
+    lo, hi = np.quantile(ratios, [alpha, 1 - alpha], axis=1)
+    return x_mean / y_mean, lo, hi
+
+
+class Comparator(Task):
+    
+    """Join a candidate result set (workflow.data_filename) with a
+    baseline (workflow.baseline_filename) by (prog, cell key), test
+    each cell for a significant difference, report speedups and
+    slowdowns, and write plotdata of candidate / baseline ratios.
+    """
+    
+    metric = 'stdmetric'
+    """Result metric to compare."""
+    
+    cell_key = ('dsparams', 'x')
+    """Key (see extractor.get_keyfunc()) identifying a cell within a
+    prog, e.g. 'tid'. Its values are also used as plot x values.
+    """
+    
+    test = 'mannwhitney'
+    """Significance test: 'mannwhitney', or 'bootstrap' for a bootstrap
+    confidence interval of the ratio of means.
+    """
+    
+    alpha = 0.05
+    """Significance level."""
+    
+    min_effect = 0.0
+    """Minimum relative change of the mean (e.g. 0.05 for 5%) for a
+    significant difference to be reported.
+    """
+    
+    bootstrap_samples = 1000
+    bootstrap_seed = 0
+    
+    ratio_ci = False
+    """Whether to compute a bootstrap confidence interval of the ratio
+    of means when test is 'mannwhitney', for the report and the plot's
+    error bars. The 'bootstrap' test always computes it. Otherwise the
+    interval is NaN.
+    """
+    
+    higher_is_better = False
+    """Whether a larger metric is an improvement rather than a
+    regression.
+    """
+    
+    fail_on_regression = False
+    """If True, raise AssertionError when any regression is found,
+    after writing all output.
+    """
+    
+    def project_y(self, p):
+        return p['results'][self.metric]
+    
+    def group_cells(self, datapoints):
+        keyfunc = get_keyfunc(self.cell_key)
+        cells = {}
+        for p in datapoints:
+            cells.setdefault((p['prog'], keyfunc(p)), []).append(
+                self.project_y(p))
+        return cells
+    
+    def compare(self, baseline, candidate):
+        """Return a list of per-cell result dicts, sorted by prog
+        and x.
+        """
+        base_cells = self.group_cells(baseline)
+        cand_cells = self.group_cells(candidate)
+        keys = sorted(base_cells.keys() & cand_cells.keys())
+        missing = len(base_cells.keys() ^ cand_cells.keys())
+        if missing > 0:
+            self.print('Warning: {} cells present in only one result '
+                       'set (ignored)'.format(missing))
+        if len(keys) == 0:
+            return []
+        
+        xs = [cand_cells[k] for k in keys]
+        ys = [base_cells[k] for k in keys]
+        if self.test == 'bootstrap' or self.ratio_ci:
+            ratio, lo, hi = bootstrap_ratio_ci(
+                xs, ys, self.bootstrap_samples, 1 - self.alpha,
+                self.bootstrap_seed)
+        else:
+            ratio = (np.array([np.mean(x) for x in xs]) /
+                     np.array([np.mean(y) for y in ys]))
+            lo = hi = np.full(len(keys), np.nan)
+        if self.test == 'mannwhitney':
+            _u, p, effect = mann_whitney_u(xs, ys)
+            significant = p < self.alpha
+        else:
+            assert self.test == 'bootstrap'
+            p = np.full(len(keys), np.nan)
+            effect = ratio - 1
+            significant = (lo > 1) | (hi < 1)
+        significant &= np.abs(ratio - 1) >= self.min_effect
+        
+        results = []
+        for i, (prog, x) in enumerate(keys):
+            worse = ratio[i] < 1 if self.higher_is_better else ratio[i] > 1
+            if not significant[i]:
+                change = None
+            elif worse:
+                change = 'regression'
+            else:
+                change = 'improvement'
+            results.append(dict(
+                prog = prog,
+                x = x,
+                ratio = float(ratio[i]),
+                ratio_lo = float(lo[i]),
+                ratio_hi = float(hi[i]),
+                p = float(p[i]),
+                effect = float(effect[i]),
+                change = change,
+            ))
+        return results
+    
+    def get_plotdata(self, results):
+        # Build the entries with an extractor's helpers, so that they
+        # follow the plotdata format of extracted results.
+        ex = Extractor(self.workflow)
+        ex.error_bars = True
+        progs = sorted(set(r['prog'] for r in results))
+        series = []
+        for prog in progs:
+            data = [(r['x'], r['ratio'],
+                     np.nan_to_num(r['ratio'] - r['ratio_lo']),
+                     np.nan_to_num(r['ratio_hi'] - r['ratio']))
+                    for r in results if r['prog'] == prog]
+            series.append(ex.make_series(prog, prog, None, '- o normal',
+                                         data))
+        axes = ex.make_axes(series,
+                            axes_title = 'Candidate / baseline',
+                            ylabel = self.metric + ' ratio',
+                            xlabel = str(self.cell_key))
+        return ex.make_plotdata([axes])
+    
+    def report(self, results):
+        changed = [r for r in results if r['change'] is not None]
+        self.print('Compared {} cells: {} regressions, {} improvements'
+                   .format(len(results),
+                           sum(r['change'] == 'regression' for r in changed),
+                           sum(r['change'] == 'improvement' for r in changed)))
+        # Largest changes first. A non-positive ratio (e.g. a count
+        # dropping to zero) counts as the largest.
+        changed.sort(key=lambda r: -abs(math.log(r['ratio']))
+                                   if r['ratio'] > 0 else -math.inf)
+        for r in changed:
+            if math.isnan(r['ratio_lo']):
+                interval = ''
+            else:
+                interval = ' [{:+.1%}, {:+.1%}]'.format(
+                           r['ratio_lo'] - 1, r['ratio_hi'] - 1)
+            self.print('  {:<12} {:<20} {:+.1%}{}  '
+                       'p={:.3g}  effect={:+.2f}'.format(
+                       r['change'], '{} @ {}'.format(r['prog'], r['x']),
+                       r['ratio'] - 1, interval, r['p'], r['effect']))
+    
+    def run(self):
+        with open(self.workflow.baseline_filename, 'rb') as in_file:
+            baseline = pickle.load(in_file)
+        with open(self.workflow.data_filename, 'rb') as in_file:
+            candidate = pickle.load(in_file)
+        
+        self.results = results = self.compare(baseline, candidate)
+        self.report(results)
+        
+        with open(self.workflow.plotdata_filename, 'wb') as out_file:
+            pickle.dump(self.get_plotdata(results), out_file)
+        
+        if (self.fail_on_regression and
+            any(r['change'] == 'regression' for r in results)):
+            raise AssertionError('Performance regression detected')
+        
+        self.print('Done.')
+    
+    @property
+    def inputs(self):
+        return [self.workflow.baseline_filename, self.workflow.data_filename]
+    
+    @property
+    def outputs(self):
+        return [self.workflow.plotdata_filename]
+    
+    def cleanup(self):
+        self.remove_file(self.workflow.plotdata_filename)
+
+
+class CompareWorkflow(Workflow):
+    
+    """Workflow comparing a candidate result data file against a
+    baseline, then viewing the ratios.
+    """
+    
+    ExpComparator = Comparator
+    ExpViewer = Plotter
+    
+    imagename = 'compare'
+    
+    def __init__(self, baseline_filename, data_filename,
+                 prefix=None, fout=sys.stdout):
+        super().__init__(prefix, fout=fout)
+        
+        self.baseline_filename = baseline_filename
+        """Result data file of the baseline."""
+        self.data_filename = data_filename
+        """Result data file of the candidate."""
+        
+        self.comparator = self.ExpComparator(self)
+        self.viewer = self.ExpViewer(self)
+        
+        self.tasks = [
+            self.comparator,
+            self.viewer,
+        ]
+    
+    @property
+    def plotdata_filename(self):
+        return self.prefix + '_compare_plotdata.pickle'
+    
+    @property
+    def png_filename(self):
+        return self.prefix + '_' + self.imagename + '.png'
+    
+    @property
+    def pdf_filename(self):
+        return self.prefix + '_' + self.imagename + '.pdf'
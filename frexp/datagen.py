@@ -63,6 +63,7 @@ class Datagen(Task):
         os.makedirs(self.workflow.ds_dirname, exist_ok=True)
         total_size = 0
         seen_dsids = set()
+        self.emit('datagen_start', datasets=len(dsparams_list))
         
         # Generate datasets, save to files.
         for i, dsp in enumerate(dsparams_list, 1):
@@ -85,6 +86,8 @@ class Datagen(Task):
                 if j > 0:
                     self.print(' ' * len(itemstring), end='')
                 self.print(' ({:,} bytes)'.format(ds_size))
+                self.emit('dataset_done', index=i, total=len(dsparams_list),
+                          dsid=dsid, size=ds_size)
         
         self.print('Total dataset size: {:,} bytes'.format(total_size))
         
@@ -98,8 +101,16 @@ class Datagen(Task):
         self.print('Generating test data...')
         with StopWatch() as w:
             self._run()
+        self.emit('datagen_end',
+                  datasets=len(glob.glob(self.workflow.ds_filename_glob)),
+                  elapsed=w.elapsed)
         self.print('(Generation time: {:.3f} seconds)'.format(w.elapsed))
     
+    @property
+    def outputs(self):
+        return ([self.workflow.params_filename] +
+                sorted(glob.glob(self.workflow.ds_filename_glob)))
+    
     def cleanup(self):
         # Remove dataset files, dataset dir, and params file.
         ds_files = glob.glob(self.workflow.ds_filename_glob)
@@ -0,0 +1,98 @@
+"""Downsampling of large series for plotting."""
+
+
+__all__ = [
+    'lttb',
+    'minmax_bins',
+    'decimate',
+]
+
+
+import numpy as np
+
+
+def _sorted_arrays(points):
+    points = sorted(points, key=lambda p: p[0])
+    xs = np.array([p[0] for p in points], dtype=float)
+    ys = np.array([p[1] for p in points], dtype=float)
+    return points, xs, ys
+
+
+def lttb(points, n):
+    """Largest-Triangle-Three-Buckets downsampling. Given (x, y, ...)
+    tuples, return at most n of them, in x order, chosen to preserve
+    the visual shape of the line. The first and last points are always
+    kept.
+    """
+    if n >= len(points) or n < 3:
+        return sorted(points, key=lambda p: p[0])
+    points, xs, ys = _sorted_arrays(points)
+    
+    # Split the interior points into n - 2 buckets of near-equal size.
+    edges = np.linspace(1, len(points) - 1, n - 1).astype(int)
+    selected = [0]
+    prev = 0
+    for i in range(n - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket, or the last point for the
+        # final bucket.
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = xs[next_start:next_end].mean()
+            avg_y = ys[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = xs[-1], ys[-1]
+        # Twice the area of the triangle formed with the previous
+        # selected point and the next bucket's average.
+        areas = np.abs((xs[prev] - avg_x) * (ys[start:end] - ys[prev]) -
+                       (xs[prev] - xs[start:end]) * (avg_y - ys[prev]))
+        prev = start + int(areas.argmax())
+        selected.append(prev)
+    selected.append(len(points) - 1)
+    
+    return [points[i] for i in selected]
+
+
+def minmax_bins(points, n):
+    """Min/max binning. Split the x range into n // 2 equal-width bins
+    (e.g. one per horizontal pixel) and keep the points with the lowest
+    and highest y in each bin, plus the first and last points. Return
+    them in x order. Extreme values (outliers) are always kept.
+    """
+    if n >= len(points) or n < 2:
+        return sorted(points, key=lambda p: p[0])
+    points, xs, ys = _sorted_arrays(points)
+    
+    nbins = n // 2
+    span = xs[-1] - xs[0]
+    if span > 0:
+        bins = ((xs - xs[0]) / span * nbins).astype(int)
+        bins = np.minimum(bins, nbins - 1)
+    else:
+        bins = np.zeros(len(xs), dtype=int)
+    
+    # Sort by bin, then y. The first index of each bin in that order
+    # is its min, and the last is its max.
+    order = np.lexsort((ys, bins))
+    sorted_bins = bins[order]
+    _, first = np.unique(sorted_bins, return_index=True)
+    last = np.append(first[1:], len(order)) - 1
+    keep = np.union1d(order[first], order[last])
+    keep = np.union1d(keep, [0, len(points) - 1])
+    
+    return [points[i] for i in keep]
+
+
+methods = {
+    'lttb': lttb,
+    'minmax': minmax_bins,
+}
+
+
+def decimate(points, method, n):
+    """Downsample points to about n using the named method, 'lttb' or
+    'minmax'. Points are returned unchanged if there are at most n.
+    """
+    if len(points) <= n:
+        return points
+    return methods[method](points, n)
@@ -0,0 +1,234 @@
+"""Reusable benchmark driver, run in the child process."""
+
+
+__all__ = [
+    'Driver',
+]
+
+
+import pickle
+import gc
+import time
+import itertools
+
+from frexp.util import MultiStopWatch, get_peak_mem_usage, deep_getsizeof
+from frexp.memory import RSSSampler, AllocationTracer
+from frexp.gcmonitor import GCMonitor
+from frexp.verifier import canonical_digest
+
+
+class Driver:
+    
+    """Base class for drivers. A subclass can be used directly as a
+    workflow's ExpDriver: the child process calls it with the pipe
+    filename, and construction does the whole job of reading the
+    dataset, prog, and other trial params from the pipe file, timing
+    the operation, and writing the results back.
+    
+    Subclasses override operation(), and optionally setup(),
+    teardown(), and get_output(). The operation is called repeatedly
+    in a loop whose length is calibrated, as in timeit, to take at
+    least target_time seconds, so that operations far shorter than the
+    timer resolution can be measured. It must therefore be safe to
+    call any number of times. Results include the time per operation
+    for each clock, and 'stdmetric', the time per operation of
+    stdmetric_clock.
+    
+    If the trial param 'verify_output' is set, the return value of
+    get_output() is included in the results as 'output', computed
+    after timing. If 'digest_output' is also set, only its canonical
+    digest is included, as 'output_digest' (see verifier.py).
+    
+    Results also include 'maxrss', the peak resident set size of the
+    child process in bytes (where the platform reports it), and
+    further memory measurements as selected by the memory attribute.
+    
+    Garbage collections during the measured loop are recorded in
+    results 'gc_collections' (a count per generation), 'gc_collected'
+    (objects freed), and 'gc_time' (pause time per operation).
+    """
+    
+    clocks = ('wall', 'process')
+    """Clocks to read (see util.clock_funcs)."""
+    
+    stdmetric_clock = 'process'
+    """Clock whose per-operation time is reported as 'stdmetric'."""
+    
+    target_time = 0.2
+    """Minimum duration in seconds of the calibrated timing loop."""
+    
+    loops = None
+    """If non-None, a fixed number of loops, skipping calibration."""
+    
+    max_calibration_time = 60
+    """Maximum total wall time in seconds to spend calibrating. Bounds
+    the search when the operation takes little or no time on the
+    stdmetric clock, e.g. if it mostly waits on I/O.
+    """
+    
+    gc_policy = 'disable'
+    """What to do with the garbage collector around each timed loop:
+    
+      - 'disable': disable it during the loop, as timeit does
+      - 'collect': run a full collection before the loop, and leave
+        it enabled
+      - 'leave': leave it alone
+    
+    Overridden by the trial param 'gc_policy', if present (see
+    ExpWorkflow.gc_policy).
+    """
+    
+    gc_policies = ['disable', 'collect', 'leave']
+    
+    memory = None
+    """Memory measurement mode, done during an extra, untimed call of
+    the operation after timing:
+    
+      - None: none
+      - 'rss': sample the resident set size every rss_interval
+        seconds, recording 'rss_peak' and 'rss_delta' (the peak's
+        growth during the call), in bytes
+      - 'tracemalloc': trace Python allocations, recording
+        'alloc_peak' and 'alloc_net' (bytes still allocated after
+        the call)
+    """
+    
+    rss_interval = 0.001
+    
+    def __init__(self, pipe_fn):
+        with open(pipe_fn, 'rb') as pf:
+            dataset, prog, other_tparams = pickle.load(pf)
+        self.dataset = dataset
+        self.prog = prog
+        self.tparams = other_tparams
+        self.results = {}
+        
+        self.setup()
+        try:
+            self.run()
+            if self.memory is not None:
+                self.measure_memory()
+            size_obj = self.get_size_object()
+            if size_obj is not None:
+                self.results['size'] = deep_getsizeof(size_obj)
+            if self.tparams.get('verify_output', False):
+                output = self.get_output()
+                if self.tparams.get('digest_output', False):
+                    self.results['output_digest'] = canonical_digest(output)
+                else:
+                    self.results['output'] = output
+        finally:
+            self.teardown()
+        try:
+            self.results['maxrss'] = get_peak_mem_usage()
+        except NotImplementedError:
+            pass
+        
+        with open(pipe_fn, 'wb') as pf:
+            pickle.dump(self.results, pf)
+    
+    def setup(self):
+        """Prepare for timing, e.g. by building inputs from
+        self.dataset and importing self.prog. Not timed.
+        """
+        pass
+    
+    def operation(self):
+        """The code to time."""
+        raise NotImplementedError
+    
+    def teardown(self):
+        """Release resources after timing. Called even on failure."""
+        pass
+    
+    def get_output(self):
+        """Return the output to verify. By default, the result of an
+        extra, untimed call to operation().
+        """
+        return self.operation()
+    
+    def get_size_object(self):
+        """Return an object whose deep size in bytes (see
+        util.deep_getsizeof()) is reported as result 'size', as
+        plotted by TotalSizeExtractor, or None to not report it.
+        Called after timing.
+        """
+        return None
+    
+    def timed_loop(self, number):
+        """Run the operation number times, and return a dict of the
+        total elapsed seconds for each clock.
+        """
+        op = self.operation
+        watch = self.watch
+        if self.policy == 'collect':
+            gc.collect()
+        gc_was_enabled = gc.isenabled()
+        if self.policy == 'disable':
+            gc.disable()
+        self.gc_monitor = GCMonitor()
+        try:
+            with self.gc_monitor, watch:
+                for _ in itertools.repeat(None, number):
+                    op()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return watch.consume()
+    
+    def calibrate(self):
+        """Find a loop count, trying 1, 2, 5, 10, 20, 50, ..., that
+        takes at least target_time on the stdmetric clock. Return the
+        count and its elapsed times. Raise ValueError if no count
+        does so within max_calibration_time.
+        """
+        start = time.perf_counter()
+        for i in itertools.count():
+            for j in (1, 2, 5):
+                number = j * 10 ** i
+                elapsed = self.timed_loop(number)
+                if elapsed[self.stdmetric_clock] >= self.target_time:
+                    return number, elapsed
+                if time.perf_counter() - start > self.max_calibration_time:
+                    raise ValueError(
+                        'Calibration gave up after {} loops: {} clock '
+                        'took {:.3g}s, below target_time {}s; set loops '
+                        'or use another stdmetric_clock'.format(
+                        number, self.stdmetric_clock,
+                        elapsed[self.stdmetric_clock], self.target_time))
+    
+    def measure_memory(self):
+        if self.memory == 'rss':
+            with RSSSampler(self.rss_interval) as sampler:
+                self.operation()
+            self.results['rss_peak'] = sampler.peak_rss
+            self.results['rss_delta'] = sampler.delta
+        elif self.memory == 'tracemalloc':
+            with AllocationTracer() as tracer:
+                self.operation()
+            self.results['alloc_peak'] = tracer.peak
+            self.results['alloc_net'] = tracer.net
+        else:
+            raise ValueError('Unknown memory mode: ' + repr(self.memory))
+    
+    def run(self):
+        self.policy = self.tparams.get('gc_policy', self.gc_policy)
+        if self.policy not in self.gc_policies:
+            raise ValueError('Unknown GC policy: ' + repr(self.policy))
+        self.watch = MultiStopWatch(self.clocks)
+        if self.loops is not None:
+            number = self.loops
+            elapsed = self.timed_loop(number)
+        else:
+            number, elapsed = self.calibrate()
+        
+        self.results['loops'] = number
+        for clock, t in elapsed.items():
+            self.results[clock + '_time'] = t / number
+        self.results['stdmetric'] = elapsed[self.stdmetric_clock] / number
+        
+        monitor = self.gc_monitor
+        self.results['gc_policy'] = self.policy
+        self.results['gc_collections'] = monitor.collections
+        self.results['gc_collected'] = monitor.collected
+        self.results['gc_time'] = monitor.pause / number
@@ -0,0 +1,137 @@
+"""Structured progress events and sinks for them.
+
+Tasks report progress by calling workflow.emit(event, **fields), which
+passes an event dict to each of the workflow's event sinks. Every
+event has the keys
+
+    'event':  event name
+    'time':   wall clock time (seconds since the epoch)
+    'prefix': workflow prefix
+
+plus event-specific fields:
+
+    datagen_start     datasets
+    dataset_done      index, total, dsid, size
+    datagen_end       datasets, elapsed
+    benchmark_start   trials
+    trial_start       index, total, tid, prog, dsid
+    repeat_done       tid, prog, repeat, stdmetric, mean, std, stable
+    convergence       tid, prog, repeats, status
+    trial_end         index, total, tid, prog, repeats, timedout,
+                      throughput (trials per second), eta (seconds)
+    benchmark_end     trials, elapsed
+    verify_group      index, total, tid, ok
+    verify_end        groups, mismatches
+
+Convergence status is one of 'converged', 'max_repeats' (stopped
+without converging), 'timedout', or 'single' (repeats disabled).
+"""
+
+
+__all__ = [
+    'JSONLinesSink',
+    'ConsoleRenderer',
+]
+
+
+import sys
+import json
+import time
+
+
+class JSONLinesSink:
+    
+    """Event sink appending each event as a line of JSON to a file.
+    Lines are buffered in memory and written out at most every
+    flush_interval seconds, at the end of each task, and on close().
+    Values that are not JSON-serializable are written as their repr().
+    """
+    
+    flush_interval = 5.0
+    
+    flush_events = {'datagen_end', 'benchmark_end', 'verify_end'}
+    """Events after which the buffer is always written out."""
+    
+    def __init__(self, filename, flush_interval=None):
+        self.filename = filename
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+    
+    def __call__(self, event):
+        self.buffer.append(json.dumps(event, default=repr))
+        if (event['event'] in self.flush_events or
+            time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+    
+    def flush(self):
+        if len(self.buffer) > 0:
+            with open(self.filename, 'at') as out_file:
+                out_file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.last_flush = time.monotonic()
+    
+    def close(self):
+        self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return '{}:{:02}:{:02}'.format(seconds // 3600, seconds // 60 % 60,
+                                   seconds % 60)
+
+
+class ConsoleRenderer:
+    
+    """Event sink printing a one-line summary of benchmark progress,
+    with throughput and ETA, at most every refresh_interval seconds,
+    and a line at the end of each task.
+    """
+    
+    refresh_interval = 10.0
+    
+    def __init__(self, file=None, refresh_interval=None):
+        self.file = file if file is not None else sys.stdout
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        self.last_render = None
+        self.not_converged = 0
+    
+    def render(self, line):
+        print(line, file=self.file, flush=True)
+        self.last_render = time.monotonic()
+    
+    def __call__(self, event):
+        kind = event['event']
+        if kind == 'convergence' and event['status'] == 'max_repeats':
+            self.not_converged += 1
+        elif kind == 'trial_end':
+            if (self.last_render is not None and
+                time.monotonic() - self.last_render < self.refresh_interval
+                and event['index'] < event['total']):
+                return
+            eta = event['eta']
+            self.render('[{}] trial {}/{}  {:.2f} trials/s  ETA {}'.format(
+                        event['prefix'], event['index'], event['total'],
+                        event['throughput'] or 0,
+                        format_duration(eta) if eta is not None else '?'))
+        elif kind == 'benchmark_end':
+            self.render('[{}] {} trials in {}, {} did not converge'.format(
+                        event['prefix'], event['trials'],
+                        format_duration(event['elapsed']),
+                        self.not_converged))
+        elif kind == 'datagen_end':
+            self.render('[{}] generated {} datasets in {}'.format(
+                        event['prefix'], event['datasets'],
+                        format_duration(event['elapsed'])))
+        elif kind == 'verify_end':
+            self.render('[{}] verified {} trial groups, {} mismatches'
+                        .format(event['prefix'], event['groups'],
+                                event['mismatches']))
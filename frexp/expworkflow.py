@@ -12,6 +12,8 @@ from frexp.workflow import Workflow
 from frexp.runner import Runner
 from frexp.verifier import Verifier
 from frexp.viewer import Plotter
+from frexp.live import LivePlotter
+from frexp.profiling import ProfileAggregator
 
 
 class ExpWorkflow(Workflow):
@@ -39,6 +41,60 @@ class ExpWorkflow(Workflow):
     do_repeats = True
     """Set False to skip converging altogether."""
     
+    fused_verify = False
+    """If True, check outputs while benchmarking instead of in a
+    separate verifier pass. The first repeat of each trial is run with
+    trial param 'verify_output' set to True, and the driver should
+    then include an 'output' entry in its results, computed outside
+    its timed region. The output is digested in the child process and
+    compared across progs of the same tid.
+    """
+    
+    filter_progs = None
+    """If non-None, a collection of progs. Only their trials are
+    benchmarked.
+    """
+    filter_dsids = None
+    """If non-None, a collection of dsids. Only their trials are
+    benchmarked.
+    """
+    filter_xrange = None
+    """If non-None, a pair (xmin, xmax), either of which may be None.
+    Only trials whose dataset params 'x' lies in this (inclusive)
+    range are benchmarked.
+    """
+    
+    @property
+    def filtering(self):
+        """Whether only some trials are to be benchmarked. If so, their
+        new datapoints replace the old ones in the existing result
+        data, and the other datapoints are kept.
+        """
+        return (self.filter_progs is not None or
+                self.filter_dsids is not None or
+                self.filter_xrange is not None)
+    
+    gc_policy = None
+    """If non-None, the garbage collector policy for timed regions,
+    passed to the driver as trial param 'gc_policy'. One of 'disable',
+    'collect' (collect before timing), or 'leave'. See Driver.gc_policy.
+    """
+    
+    profile_trials = None
+    """If True, or a function taking a trial params dict and returning
+    True for the trials to profile, capture a profile of each selected
+    trial. After a trial's timed repeats, the driver is run once more,
+    untimed, under cProfile. The profile is saved in profiles_dirname,
+    and its filename is recorded in the trial's datapoints under key
+    'profile'. See also profile_report().
+    """
+    
+    live_plot = False
+    """If True, show a live-updating plot of the results while
+    benchmarking. Requires a single-metric extractor (one that defines
+    project_y()).
+    """
+    
     # This has saved me countless times from accidentally running
     # tests on power-saving procesor speed.
     require_ac = True
@@ -72,6 +128,21 @@ class ExpWorkflow(Workflow):
         """
         return self.prefix + '_pipe.pickle'
     
+    def get_pipe_filename(self, n):
+        """Filename for the n-th of several pipe files, used when
+        running driver programs concurrently.
+        """
+        return self.prefix + '_pipe_{}.pickle'.format(n)
+    
+    @property
+    def profiles_dirname(self):
+        """Directory containing captured profiles."""
+        return self.prefix + '_profiles/'
+    
+    def get_profile_filename(self, tid, prog):
+        """Filename for the profile of a trial."""
+        return self.profiles_dirname + 'prof_{}_{}.pstats'.format(tid, prog)
+    
     @property
     def data_filename(self):
         """Filename for result data."""
@@ -82,6 +153,11 @@ class ExpWorkflow(Workflow):
         """Filename for extracted plot data."""
         return self.prefix + '_plotdata.pickle'
     
+    @property
+    def plotcache_filename(self):
+        """Filename for cached aggregated series."""
+        return self.prefix + '_plotcache.pickle'
+    
     imagename = 'plot'
     """Component of filename for generated image files."""
     
@@ -100,6 +176,17 @@ class ExpWorkflow(Workflow):
         """Filename for plot data as csv."""
         return self.prefix + '_' + self.imagename + '.csv'
     
+    @property
+    def fit_csv_filename(self):
+        """Filename for fitted series models as csv."""
+        return self.prefix + '_' + self.imagename + '_fit.csv'
+    
+    def get_axes_csv_filename(self, i):
+        """Filename for the csv data of the i-th axes, for plots
+        with several axes.
+        """
+        return self.prefix + '_' + self.imagename + '_{}.csv'.format(i)
+    
     @property
     def ExpDatagen(self):
         raise NotImplementedError
@@ -111,6 +198,7 @@ class ExpWorkflow(Workflow):
     ExpRunner = Runner
     ExpVerifier = Verifier
     ExpViewer = Plotter
+    ExpProfileAggregator = ProfileAggregator
     
     @property
     def ExpDriver(self):
@@ -122,7 +210,9 @@ class ExpWorkflow(Workflow):
     @property
     def ExpVerifyDriver(self):
         """Function or class to call in the child process to verify
-        results. Must be pickleable.
+        results. Must be pickleable. It is run with trial param
+        'verify_output' set to True, and must include an 'output' entry
+        in its results (as driver.Driver does).
         """
         raise NotImplementedError
     
@@ -134,6 +224,10 @@ class ExpWorkflow(Workflow):
         self.verifier = self.ExpVerifier(self)
         self.extractor = self.ExpExtractor(self)
         self.viewer = self.ExpViewer(self)
+        self.profile_aggregator = self.ExpProfileAggregator(self)
+        
+        if self.live_plot:
+            self.runner.listeners.append(LivePlotter(self.extractor))
         
         self.tasks = [
             self.datagen,
@@ -157,3 +251,6 @@ class ExpWorkflow(Workflow):
     
     def view(self):
         self.viewer.run()
+    
+    def profile_report(self):
+        self.profile_aggregator.run()
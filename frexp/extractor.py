@@ -2,10 +2,13 @@
 
 
 __all__ = [
+    'axes_csvdata',
     'Extractor',
     'SimpleExtractor',
     'MetricExtractor',
     'TotalSizeExtractor',
+    'MemoryExtractor',
+    'MultiMetricExtractor',
     'NormalizedExtractor',
     'ScaledExtractor',
 ]
@@ -16,7 +19,12 @@ import math
 from itertools import groupby
 from operator import itemgetter
 import csv
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
+
+from .util import fingerprint, file_digest
+from .fitting import fit_series
 from .workflow import Task
 
 
@@ -64,6 +72,77 @@ def parse_style(style):
     return lf, mf, hollow_markers, marker_border, series_format, dashes
 
 
+def get_keyfunc(key):
+    """Turn a key specification into a function on datapoints.
+    
+    key may be a callable taking a datapoint, a string naming a
+    top-level field of the datapoint (e.g. 'prog' or 'tid'), or a
+    tuple of field names giving a path into nested dicts (e.g.
+    ('dsparams', 'x')).
+    """
+    if callable(key):
+        return key
+    elif isinstance(key, str):
+        return itemgetter(key)
+    elif isinstance(key, tuple):
+        def keyfunc(p):
+            for k in key:
+                p = p[k]
+            return p
+        return keyfunc
+    else:
+        raise ValueError('Invalid key: ' + repr(key))
+
+
+def bootstrap_ci(ys, samples, confidence, seed):
+    """Return a (lo, hi) bootstrap percentile confidence interval for
+    the mean of ys. All resamples are drawn and averaged at once as a
+    (samples x len(ys)) array.
+    """
+    ys = np.asarray(ys, dtype=float)
+    if len(ys) < 2:
+        m = float(ys.mean())
+        return m, m
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(ys), size=(samples, len(ys)))
+    means = ys[indices].mean(axis=1)
+    alpha = (1 - confidence) / 2
+    lo, hi = np.quantile(means, [alpha, 1 - alpha])
+    return float(lo), float(hi)
+
+def _bootstrap_ci_cell(args):
+    # Picklable adapter for mapping over a process pool.
+    return bootstrap_ci(*args)
+
+
+def axes_csvdata(axes):
+    """Return a header and list of row dicts tabulating the y values
+    of each series of the axes entry, by x.
+    """
+    header = ['x']
+    all_x = set()
+    data = {}
+    for s in axes['series']:
+        if len(s['data']) == 0:
+            continue
+        series_name = s['name']
+        header.append(series_name)
+        series_data = data.setdefault(series_name, {})
+        for (x, y, _, _) in s['data']:
+            assert x not in series_data
+            series_data[x] = y
+            all_x.add(x)
+    
+    csvdata = []
+    for x in sorted(all_x):
+        row = {'x': x}
+        row.update((series_name, series_data.get(x, None))
+                   for series_name, series_data in data.items())
+        csvdata.append(row)
+    
+    return header, csvdata
+
+
 class Extractor(Task):
     
     """Abstract base class for extractors. Defines utility functions
@@ -71,6 +150,11 @@ class Extractor(Task):
     """
     
     generate_csv = True
+    csv_layout = 'per_axes'
+    """How to write CSV output for plots with several axes: 'per_axes'
+    writes one file per axes (see workflow.get_axes_csv_filename()),
+    'wide' writes a single file with one column per (axes, series).
+    """
     
     # Override to alter display characteristics.
     rcparams_file = None
@@ -97,6 +181,10 @@ class Extractor(Task):
     xlabelpad = None
     ylabelpad = None
     
+    _indexed_data = None
+    _indexes = None
+    _pool = None
+    
     @property
     def config(self):
         return {key: getattr(self, key)
@@ -112,18 +200,34 @@ class Extractor(Task):
             (x, avg y, y low delta, y high delta).
         
         For each x value, all the corresponding y values are grouped
-        together. These y values are averaged, then the high and low
-        percentile values are discarded. The difference between the
-        remaining extreme values and the average become the low and high
-        deltas.
+        together and averaged. The deltas depend on error_mode:
+        
+          'minmax': the high and low percentile values are discarded,
+            and the difference between the remaining extreme values and
+            the average become the low and high deltas.
+          
+          'bootstrap': the deltas are the distance from the average to
+            the bounds of a bootstrap confidence interval of the mean.
         """
         xy = list(xy)
         xy.sort(key=itemgetter(0))
+        groups = [(x, sorted(p[1] for p in grouped))
+                  for x, grouped in groupby(xy, key=itemgetter(0))]
+        
+        if self.error_mode == 'bootstrap':
+            cells = [(ys, self.bootstrap_samples, self.confidence,
+                      (self.bootstrap_seed, i))
+                     for i, (_x, ys) in enumerate(groups)]
+            cis = self.map_cells(_bootstrap_ci_cell, cells)
+            result = []
+            for (x, ys), (lo, hi) in zip(groups, cis):
+                avg_y = sum(ys) / len(ys)
+                result.append((x, avg_y, avg_y - lo, hi - avg_y))
+            return result
         
+        assert self.error_mode == 'minmax'
         result = []
-        for x, grouped in groupby(xy, key=itemgetter(0)):
-            ys = sorted(p[1] for p in grouped)
-            
+        for x, ys in groups:
             # Compute average including outliers.
             avg_y = sum(ys) / len(ys)
             
@@ -138,6 +242,26 @@ class Extractor(Task):
         
         return result
     
+    def map_cells(self, func, cells):
+        """Return [func(c) for c in cells], spread over a pool of
+        bootstrap_workers processes if that is greater than 1.
+        The pool is kept for the duration of run().
+        """
+        workers = self.bootstrap_workers
+        if workers is None or workers <= 1 or len(cells) < 2:
+            return [func(c) for c in cells]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(workers)
+        chunksize = max(1, len(cells) // (workers * 4))
+        return list(self._pool.map(func, cells, chunksize=chunksize))
+    
+    def close_pool(self):
+        """Shut down the worker pool, if any."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    plot_title = None
     title = None
     ylabel = None
     xlabel = None
@@ -151,6 +275,21 @@ class Extractor(Task):
     error_bars = False
     discard_ratio = 0.0
     
+    error_mode = 'minmax'
+    """How error deltas are computed when averaging, either 'minmax'
+    or 'bootstrap'. See average_points().
+    """
+    bootstrap_samples = 1000
+    """Number of resamples per (series, x) cell in bootstrap mode."""
+    confidence = 0.95
+    """Confidence level of bootstrap intervals."""
+    bootstrap_seed = 0
+    """Seed for bootstrap resampling, for reproducible error bars."""
+    bootstrap_workers = None
+    """Number of processes to spread bootstrap cells over. None or 1
+    computes them in this process.
+    """
+    
     series = []
     """List of (series name, display name, color, style),
     in order of display.
@@ -173,6 +312,26 @@ class Extractor(Task):
         """
         raise NotImplementedError
     
+    def get_index(self, datapoints, key):
+        """Return a dict mapping each value of the given key (see
+        get_keyfunc()) to the list of datapoints having that value,
+        in their original order.
+        
+        The index is built in one pass the first time it is requested
+        and reused for as long as the same datapoints list is passed in.
+        """
+        if self._indexed_data is not datapoints:
+            self._indexed_data = datapoints
+            self._indexes = {}
+        index = self._indexes.get(key, None)
+        if index is None:
+            keyfunc = get_keyfunc(key)
+            index = {}
+            for p in datapoints:
+                index.setdefault(keyfunc(p), []).append(p)
+            self._indexes[key] = index
+        return index
+    
     def project_data(self, datapoints):
         """Given datapoints, apply the projection function to get
         (x, y) coordinates.
@@ -198,6 +357,79 @@ class Extractor(Task):
         points = self.project_and_average_data(data, average=average)
         return points
     
+    cache_series = False
+    """If True, cache the aggregated points of each series in
+    workflow.plotcache_filename. Entries are keyed on the contents of
+    the data file, the attributes named in cache_attrs, and the code of
+    the methods named in cache_funcs and the functions in cache_helpers.
+    Code they call that is not listed, e.g. in numpy or in other
+    modules, is not tracked. Presentation-only changes (names,
+    colors, styles, limits) then reuse the cached numbers, and the data
+    file is only unpickled if some series needs recomputing.
+    """
+    cache_attrs = ['metric', 'metrics', 'series_key', 'discard_ratio',
+                   'error_mode', 'bootstrap_samples', 'confidence',
+                   'bootstrap_seed', 'base_sid', 'base_sid_map',
+                   'missing_policy', 'vectorized']
+    """Attributes that affect the aggregated numbers. Subclasses with
+    additional such attributes should extend this list.
+    """
+    cache_funcs = ['project_x', 'project_y', 'project_metrics',
+                   'project_data', 'project_and_average_data',
+                   'get_index', 'get_series_data',
+                   'get_series_points', 'get_series_points_multi',
+                   'average_points', 'map_cells', 'normalize',
+                   'get_base_sid', 'get_base_values']
+    """Methods that affect the aggregated numbers. Subclasses with
+    additional such methods should extend this list.
+    """
+    cache_helpers = ['get_keyfunc', 'bootstrap_ci', '_bootstrap_ci_cell']
+    """Names of functions of this module that affect the aggregated
+    numbers.
+    """
+    
+    data = None
+    _data_digest = None
+    _cache = None
+    _new_cache = None
+    
+    def load_data(self):
+        """Return the datapoints, unpickling them on first use."""
+        if self.data is None:
+            with open(self.workflow.data_filename, 'rb') as in_file:
+                self.data = pickle.load(in_file)
+        return self.data
+    
+    def get_series_cache_key(self, sid, average):
+        attrs = [(attr, getattr(self, attr, None))
+                 for attr in self.cache_attrs]
+        funcs = [getattr(self, name, None) for name in self.cache_funcs]
+        helpers = [globals()[name] for name in self.cache_helpers]
+        return fingerprint(self._data_digest, sid, average, attrs, *funcs,
+                           *helpers)
+    
+    def get_cached(self, sid, average, compute):
+        """Return compute(datapoints) for the loaded data, consulting
+        the series cache for (sid, average) if cache_series is set.
+        """
+        if not self.cache_series:
+            return compute(self.load_data())
+        
+        key = self.get_series_cache_key(sid, average)
+        value = self._cache.get(key, None)
+        if value is None:
+            value = compute(self.load_data())
+        self._new_cache[key] = value
+        return value
+    
+    def get_cached_series_points(self, sid, *, average):
+        """As get_series_points() on the loaded data, but consult the
+        series cache if cache_series is set.
+        """
+        return self.get_cached(
+            sid, average,
+            lambda data: self.get_series_points(data, sid, average=average))
+    
     def get_dispname(self, sid, dispname):
         """Hook for changing the display name of a series."""
         return dispname
@@ -206,100 +438,209 @@ class Extractor(Task):
         """Hook for scaling data."""
         return data
     
+    fit_models = None
+    """If non-None, a list of model names from fitting.model_names
+    (e.g. ['n', 'nlogn', 'n2', 'power']) to fit each series against.
+    The best fit is stored under the series' 'fit' key and written to
+    workflow.fit_csv_filename.
+    """
+    
+    decimation = None
+    """If non-None, a (method, n) pair used to downsample each series to
+    about n points for plotting, where method is 'lttb' or 'minmax'
+    (see decimate.py). It is recorded in the series' 'decimation' key
+    and applied when drawing, so that plotdata, CSV output, and fits
+    keep the full series.
+    """
+    series_decimation = {}
+    """Map from sid to a (method, n) pair or None, overriding
+    decimation for that series.
+    """
+    
+    def make_series(self, sid, dispname, color, style, data):
+        """Build the plotdata entry for a series, given its points."""
+        (linestyle, markerstyle, hollow_markers, marker_border,
+            series_format, dashes) = parse_style(style)
+        dispname = self.get_dispname(sid, dispname)
+        data = self.scale_data(sid, data)
+        fit = (fit_series(data, self.fit_models)
+               if self.fit_models is not None else None)
+        decimation = self.series_decimation.get(sid, self.decimation)
+        return dict(
+            name = dispname,
+            linestyle = linestyle,
+            markerstyle = markerstyle,
+            color = color,
+            errorbars = self.error_bars,
+            format = series_format,
+            hollow_markers = hollow_markers,
+            marker_border = marker_border,
+            dashes = dashes,
+            data = data,
+            fit = fit,
+            decimation = decimation,
+        )
+    
     def get_series(self):
         results = []
         for sid, dispname, color, style in self.series:
-            (linestyle, markerstyle, hollow_markers, marker_border,
-                series_format, dashes) = parse_style(style)
-            data = self.get_series_points(self.data, sid,
-                                          average=(series_format != 'points'))
-            dispname = self.get_dispname(sid, dispname)
-            data = self.scale_data(sid, data)
-            results.append(dict(
-                name = dispname,
-                linestyle = linestyle,
-                markerstyle = markerstyle,
-                color = color,
-                errorbars = self.error_bars,
-                format = series_format,
-                hollow_markers = hollow_markers,
-                marker_border = marker_border,
-                dashes = dashes,
-                data = data,
-            ))
+            series_format = parse_style(style)[4]
+            data = self.get_cached_series_points(
+                        sid, average=(series_format != 'points'))
+            results.append(self.make_series(sid, dispname, color,
+                                            style, data))
         return results
     
-    def get_plotdata(self):
+    def make_axes(self, series, **overrides):
+        """Build the plotdata entry for an axes holding the given
+        series. Keyword arguments override the extractor's attributes.
+        """
+        axes = dict(
+            axes_title = self.title,
+            ylabel = self.ylabel,
+            xlabel = self.xlabel,
+            logx = self.logx,
+            logy = self.logy,
+            scalarx = self.scalarx,
+            scalary = self.scalary,
+            no_legend = self.no_legend,
+            legend_ncol = self.legend_ncol,
+            legend_loc = self.legend_loc,
+            legend_bbox = self.legend_bbox,
+            ylabelpad = self.ylabelpad,
+            xlabelpad = self.xlabelpad,
+            series = series,
+        )
+        axes.update(overrides)
+        return axes
+    
+    def get_axes(self):
+        """Return the list of axes entries for the plot."""
+        return [self.make_axes(self.get_series())]
+    
+    def make_plotdata(self, axes):
+        """Build the plotdata for a plot with the given axes entries."""
         return dict(
-            plot_title = None,
-            axes = [dict(
-                axes_title = self.title,
-                ylabel = self.ylabel,
-                xlabel = self.xlabel,
-                logx = self.logx,
-                logy = self.logy,
-                scalarx = self.scalarx,
-                scalary = self.scalary,
-                no_legend = self.no_legend,
-                legend_ncol = self.legend_ncol,
-                legend_loc = self.legend_loc,
-                legend_bbox = self.legend_bbox,
-                ylabelpad = self.ylabelpad,
-                xlabelpad = self.xlabelpad,
-                series = self.get_series(),
-            )],
+            plot_title = self.plot_title,
+            axes = axes,
             rcparams_file = self.rcparams_file,
             rcparams = self.rcparams,
             config = self.config,
         )
     
+    def get_plotdata(self):
+        return self.make_plotdata(self.get_axes())
+    
     def get_csvdata(self, axes):
+        return axes_csvdata(axes)
+    
+    def get_wide_csvdata(self, axes_list):
+        """Like get_csvdata(), but merge several axes into one table.
+        Columns are named "<axes title>: <series name>".
+        """
         header = ['x']
-        all_x = set()
-        data = {}
-        for s in axes['series']:
-            if len(s['data']) == 0:
-                continue
-            series_name = s['name']
-            header.append(series_name)
-            series_data = data.setdefault(series_name, {})
-            for (x, y, _, _) in s['data']:
-                assert x not in series_data
-                series_data[x] = y
-                all_x.add(x)
-        
+        rows = {}
+        for i, ax in enumerate(axes_list):
+            axes_title = ax['axes_title'] or str(i)
+            ax_header, ax_csvdata = self.get_csvdata(ax)
+            header.extend(axes_title + ': ' + name
+                          for name in ax_header[1:])
+            for ax_row in ax_csvdata:
+                row = rows.setdefault(ax_row['x'], {'x': ax_row['x']})
+                row.update((axes_title + ': ' + name, ax_row[name])
+                           for name in ax_header[1:])
+        csvdata = [rows[x] for x in sorted(rows)]
+        return header, csvdata
+    
+    def get_fit_csvdata(self, axes_list):
+        """Return header and rows listing the best fit of each series."""
+        header = ['axes', 'series', 'model', 'a', 'b', 'k', 'rss', 'r2']
         csvdata = []
-        for x in sorted(all_x):
-            row = {'x': x}
-            row.update((series_name, series_data.get(x, None))
-                       for series_name, series_data in data.items())
-            csvdata.append(row)
-        
+        for i, ax in enumerate(axes_list):
+            for s in ax['series']:
+                fit = s.get('fit', None)
+                if fit is None:
+                    continue
+                row = {'axes': ax['axes_title'] or str(i),
+                       'series': s['name'], 'model': fit['model'],
+                       'rss': fit['rss'], 'r2': fit['r2']}
+                row.update(fit['params'])
+                csvdata.append(row)
         return header, csvdata
     
+    def write_csv(self, filename, header, csvdata):
+        with open(filename, 'wt', newline='') as out_csv_file:
+            wr = csv.DictWriter(out_csv_file, header)
+            wr.writeheader()
+            wr.writerows(csvdata)
+    
     def run(self):
-        with open(self.workflow.data_filename, 'rb') as in_file:
-            self.data = pickle.load(in_file)
+        self.data = None
+        if self.cache_series:
+            self._data_digest = file_digest(self.workflow.data_filename)
+            try:
+                with open(self.workflow.plotcache_filename, 'rb') as in_file:
+                    self._cache = pickle.load(in_file)
+            except FileNotFoundError:
+                self._cache = {}
+            self._new_cache = {}
+        else:
+            self.load_data()
         
-        plotdata = self.get_plotdata()
+        try:
+            plotdata = self.get_plotdata()
+        finally:
+            self.close_pool()
+        
+        if self.cache_series:
+            # Only keep entries used by this run.
+            reused = len(self._new_cache.keys() & self._cache.keys())
+            self.print('Reused {} of {} cached series.'.format(
+                       reused, len(self._new_cache)))
+            with open(self.workflow.plotcache_filename, 'wb') as out_file:
+                pickle.dump(self._new_cache, out_file)
         
         with open(self.workflow.plotdata_filename, 'wb') as out_file:
             pickle.dump(plotdata, out_file)
         
         if self.generate_csv:
-            assert len(plotdata['axes']) == 1
-            header, csvdata = self.get_csvdata(plotdata['axes'][0])
-            
-            with open(self.workflow.csv_filename, 'wt', newline='') \
-                    as out_csv_file:
-                wr = csv.DictWriter(out_csv_file, header)
-                wr.writeheader()
-                wr.writerows(csvdata)
+            axes_list = plotdata['axes']
+            if len(axes_list) == 1:
+                self.write_csv(self.workflow.csv_filename,
+                               *self.get_csvdata(axes_list[0]))
+            elif self.csv_layout == 'wide':
+                self.write_csv(self.workflow.csv_filename,
+                               *self.get_wide_csvdata(axes_list))
+            else:
+                assert self.csv_layout == 'per_axes'
+                for i, ax in enumerate(axes_list):
+                    self.write_csv(self.workflow.get_axes_csv_filename(i),
+                                   *self.get_csvdata(ax))
+            if self.fit_models is not None:
+                self.write_csv(self.workflow.fit_csv_filename,
+                               *self.get_fit_csvdata(axes_list))
+        
+        if self.fit_models is not None:
+            for ax in plotdata['axes']:
+                for s in ax['series']:
+                    if s['fit'] is not None:
+                        self.print('  {}: {} (r2 = {:.4f})'.format(
+                                   s['name'], s['fit']['model'],
+                                   s['fit']['r2']))
         
         self.print('Done.')
     
+    @property
+    def inputs(self):
+        return [self.workflow.data_filename]
+    
+    @property
+    def outputs(self):
+        return [self.workflow.plotdata_filename]
+    
     def cleanup(self):
         self.remove_file(self.workflow.plotdata_filename)
+        self.remove_file(self.workflow.plotcache_filename)
 
 
 class SimpleExtractor(Extractor):
@@ -308,12 +649,16 @@ class SimpleExtractor(Extractor):
     a prog series.
     """
     
-    # Series ids are just prog names.
+    series_key = 'prog'
+    """Key identifying the series a datapoint belongs to. Series ids
+    are values of this key, by default prog names. See get_keyfunc()
+    for the allowed forms, e.g. 'tid' or ('dsparams', 'size').
+    """
     
     def get_series_data(self, datapoints, sid):
-        # Pick out the points for this prog.
-        data = [p for p in datapoints if p['prog'] == sid]
-        return data
+        # Pick out the points for this series using the index.
+        index = self.get_index(datapoints, self.series_key)
+        return list(index.get(sid, []))
 
 
 class MetricExtractor(SimpleExtractor):
@@ -342,6 +687,69 @@ class TotalSizeExtractor(SimpleExtractor):
         return p['results']['size']
 
 
+class MemoryExtractor(MetricExtractor):
+    
+    """Show a memory metric recorded by a Driver (see Driver.memory),
+    in MiB.
+    """
+    
+    metric = 'rss_peak'
+    ylabel = 'Memory (MiB)'
+    
+    def project_y(self, p):
+        return p['results'][self.metric] / 2 ** 20
+
+
+class MultiMetricExtractor(SimpleExtractor):
+    
+    """Extractor that shows several metrics, one per axes, computing
+    all of them in a single pass over each series' datapoints.
+    """
+    
+    metrics = []
+    """List of (metric, axes title, ylabel) triples, in order of
+    display.
+    """
+    
+    def project_metrics(self, p):
+        """Grab the list of y values, one per metric, from datapoint."""
+        results = p['results']
+        return [results[metric] for metric, _, _ in self.metrics]
+    
+    def get_series_points_multi(self, datapoints, sid, *, average):
+        """Like get_series_points(), but return a list of point lists,
+        one per metric.
+        """
+        data = self.get_series_data(datapoints, sid)
+        rows = [(self.project_x(p), self.project_metrics(p))
+                for p in data]
+        result = []
+        for i in range(len(self.metrics)):
+            xy = [(x, ys[i]) for x, ys in rows]
+            if average:
+                points = self.average_points(xy, self.discard_ratio)
+            else:
+                points = [(x, y, 0, 0) for (x, y) in xy]
+            result.append(points)
+        return result
+    
+    def get_axes(self):
+        axes_series = [[] for _ in self.metrics]
+        for sid, dispname, color, style in self.series:
+            average = parse_style(style)[4] != 'points'
+            all_points = self.get_cached(
+                sid, average,
+                lambda data: self.get_series_points_multi(
+                                    data, sid, average=average))
+            for series, points in zip(axes_series, all_points):
+                series.append(self.make_series(sid, dispname, color,
+                                               style, points))
+        
+        return [self.make_axes(series, axes_title=title, ylabel=ylabel)
+                for (_, title, ylabel), series
+                in zip(self.metrics, axes_series)]
+
+
 class NormalizedExtractor(SimpleExtractor):
     
     """Base class for extractors that normalize (e.g. by subtraction
@@ -361,43 +769,101 @@ class NormalizedExtractor(SimpleExtractor):
     
     error_bars = False
     
+    missing_policy = 'skip'
+    """What to do with a point whose x value has no counterpart in
+    the base series: 'skip' drops the point with a warning, 'error'
+    raises ValueError.
+    """
+    
+    vectorized = False
+    """If True, normalize() is called once per series with numpy
+    arrays of y values and base y values, instead of once per point.
+    """
+    
+    _base_cache_data = None
+    _base_cache = None
+    
     def normalize(self, pre_y, base_y):
         """Return the normalized value of pre_y relative to base_y."""
         raise NotImplementedError
     
-    def get_series_points(self, datapoints, sid, *,
-                          average):
-        """Given datapoints and a series id, return a list of
-        (x, y) points with error data.
+    def get_base_sid(self, sid):
+        """Return the sid used to normalize sid, or None if sid
+        is not displayed.
         """
-        
         # Only use one or the other.
         assert not (self.base_sid_map is not None and
                     self.base_sid is not None)
         
         if self.base_sid_map is not None:
-            base_sid = self.base_sid_map.get(sid, None)
-            if base_sid is None:
-                return []
+            return self.base_sid_map.get(sid, None)
         elif self.base_sid is not None:
-            base_sid = self.base_sid
-            if sid == base_sid:
-                return []
+            if sid == self.base_sid:
+                return None
+            return self.base_sid
         else:
             assert()
+    
+    def get_base_values(self, datapoints, base_sid):
+        """Return a dict from x to average y for the base series.
+        Each base series is averaged only once for the given
+        datapoints.
+        """
+        if self._base_cache_data is not datapoints:
+            self._base_cache_data = datapoints
+            self._base_cache = {}
+        values = self._base_cache.get(base_sid, None)
+        if values is None:
+            base_points = super().get_series_points(datapoints, base_sid,
+                                                    average=True)
+            values = {x: y for (x, y, _, _) in base_points}
+            self._base_cache[base_sid] = values
+        return values
+    
+    def get_series_points(self, datapoints, sid, *,
+                          average):
+        """Given datapoints and a series id, return a list of
+        (x, y) points with error data.
+        """
+        base_sid = self.get_base_sid(sid)
+        if base_sid is None:
+            return []
         
-        base_points = super().get_series_points(datapoints, base_sid,
-                                                average=True)
+        base_values = self.get_base_values(datapoints, base_sid)
         sid_points = super().get_series_points(datapoints, sid,
                                                average=True)
         
-        points = []
-        for (x, y, _, _), (base_x, base_y, _, _) in \
-                zip(sid_points, base_points):
-            assert x == base_x
-            adjusted_y = self.normalize(y, base_y)
-            points.append((x, adjusted_y, 0, 0))
-        return points
+        # Hash join on x.
+        xs = []
+        ys = []
+        base_ys = []
+        missing = []
+        for (x, y, _, _) in sid_points:
+            base_y = base_values.get(x, None)
+            if base_y is None:
+                missing.append(x)
+                continue
+            xs.append(x)
+            ys.append(y)
+            base_ys.append(base_y)
+        
+        if len(missing) > 0:
+            msg = 'No {} value for {} at x = {}'.format(
+                  base_sid, sid, ', '.join(str(x) for x in missing))
+            if self.missing_policy == 'error':
+                raise ValueError(msg)
+            self.print('Warning: ' + msg + ' (skipped)')
+        
+        if self.vectorized:
+            adjusted_ys = self.normalize(np.array(ys, dtype=float),
+                                         np.array(base_ys, dtype=float))
+            adjusted_ys = adjusted_ys.tolist()
+        else:
+            adjusted_ys = [self.normalize(y, base_y)
+                           for y, base_y in zip(ys, base_ys)]
+        
+        return [(x, adjusted_y, 0, 0)
+                for x, adjusted_y in zip(xs, adjusted_ys)]
 
 
 class ScaledExtractor(Extractor):
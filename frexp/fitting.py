@@ -0,0 +1,139 @@
+"""Fitting series against candidate asymptotic complexity models."""
+
+
+__all__ = [
+    'model_names',
+    'fit_series',
+]
+
+
+import math
+
+import numpy as np
+
+
+# Each linear model is y = a * f(x) + b, fit by least squares. The
+# constant model, y = b, is fit separately.
+linear_models = {
+    'const': None,
+    'logn': np.log,
+    'n': lambda x: x,
+    'nlogn': lambda x: x * np.log(x),
+    'n2': lambda x: x ** 2,
+    'n3': lambda x: x ** 3,
+}
+
+# Each log-linear model is fit as a line after taking logs:
+#   power:  y = a * x ** k   <=>  log y = log a + k log x
+#   exp:    y = a * e ** (k x)   <=>  log y = log a + k x
+loglinear_models = {
+    'power': (np.log, lambda a, k, x: a * x ** k),
+    'exp': (lambda x: x, lambda a, k, x: a * np.exp(k * x)),
+}
+
+model_names = sorted(linear_models) + sorted(loglinear_models)
+"""Names of all available models."""
+
+
+def num_params(name):
+    """Return the number of fitted parameters of a model."""
+    return 1 if name == 'const' else 2
+
+
+def fit_model(name, xs, ys):
+    """Fit one model. Return (params, predicted ys), or None if the
+    model does not apply to this data (e.g. log of non-positive values).
+    """
+    with np.errstate(all='ignore'):
+        if name == 'const':
+            b = ys.mean()
+            return {'b': float(b)}, np.full_like(ys, b)
+        if name in linear_models:
+            fx = linear_models[name](xs)
+            if not np.all(np.isfinite(fx)):
+                return None
+            A = np.column_stack([fx, np.ones_like(xs)])
+            (a, b), *_ = np.linalg.lstsq(A, ys, rcond=None)
+            return {'a': float(a), 'b': float(b)}, a * fx + b
+        
+        transform, predict = loglinear_models[name]
+        if np.any(ys <= 0):
+            return None
+        tx = transform(xs)
+        if not np.all(np.isfinite(tx)):
+            return None
+        k, log_a = np.polyfit(tx, np.log(ys), 1)
+        a = np.exp(log_a)
+        predicted = predict(a, k, xs)
+        if not np.all(np.isfinite(predicted)):
+            return None
+        return {'a': float(a), 'k': float(k)}, predicted
+
+
+def fit_series(points, models=None):
+    """Given (x, y, lo, hi) points, fit each of the named models
+    (default all) and return a dict
+    
+        {
+            'model': <name of best model>,
+            'params': <params of best model>,
+            'rss': <residual sum of squares of best model>,
+            'r2': <coefficient of determination of best model>,
+            'bic': <Bayesian information criterion of best model>,
+            'residuals': [<y - predicted y>, ...],
+            'fits': {<name>: {'params':, 'rss':, 'r2':, 'bic':}, ...},
+        }
+    
+    Models are scored by BIC, computed from the residual sum of squares
+    in the original (not log) space, so that extra parameters must pay
+    for themselves: 'const' has one parameter, the others two. Models
+    whose BIC
+    is within 2 of the lowest are treated as equally good, and among
+    those the one with fewest parameters wins, then one of fixed shape
+    over 'power' or 'exp'. These have the same parameter count as the
+    linear models but a free exponent, which lets them follow noise
+    more closely, so on its own BIC would still favor them slightly.
+    Return None if there are fewer than three distinct x values.
+    """
+    if models is None:
+        models = model_names
+    xs = np.array([p[0] for p in points], dtype=float)
+    ys = np.array([p[1] for p in points], dtype=float)
+    if len(set(xs)) < 3:
+        return None
+    
+    n = len(ys)
+    ss_tot = float(((ys - ys.mean()) ** 2).sum())
+    # Fits within rounding error of exact are equally good.
+    min_rss = np.finfo(float).eps * max(float((ys ** 2).sum()), 1.0)
+    fits = {}
+    residuals = {}
+    for name in models:
+        result = fit_model(name, xs, ys)
+        if result is None:
+            continue
+        params, predicted = result
+        residuals[name] = ys - predicted
+        rss = float((residuals[name] ** 2).sum())
+        r2 = 1 - rss / ss_tot if ss_tot > 0 else 1.0
+        bic = (n * math.log(max(rss, min_rss) / n)
+               + num_params(name) * math.log(n))
+        fits[name] = {'params': params, 'rss': rss, 'r2': r2, 'bic': bic}
+    
+    if not fits:
+        return None
+    min_bic = min(fit['bic'] for fit in fits.values())
+    name = min((name for name, fit in fits.items()
+                if fit['bic'] <= min_bic + 2),
+               key=lambda name: (num_params(name),
+                                 name in loglinear_models,
+                                 fits[name]['bic']))
+    return dict(
+        model = name,
+        params = fits[name]['params'],
+        rss = fits[name]['rss'],
+        r2 = fits[name]['r2'],
+        bic = fits[name]['bic'],
+        residuals = residuals[name].tolist(),
+        fits = fits,
+    )
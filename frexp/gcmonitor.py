@@ -0,0 +1,50 @@
+"""Garbage collector instrumentation."""
+
+
+__all__ = [
+    'GCMonitor',
+]
+
+
+import gc
+import time
+
+
+class GCMonitor:
+    
+    """Context manager that records, via gc.callbacks, the garbage
+    collections that happen within its body: the number per generation,
+    the total pause time, and the numbers of objects collected and
+    found uncollectable.
+    """
+    
+    def __init__(self):
+        self.collections = [0] * len(gc.get_count())
+        """Number of collections of each generation."""
+        self.pause_ns = 0
+        """Total time spent collecting, in nanoseconds."""
+        self.collected = 0
+        self.uncollectable = 0
+        self._start = None
+    
+    def callback(self, phase, info):
+        if phase == 'start':
+            self._start = time.perf_counter_ns()
+        elif self._start is not None:
+            self.pause_ns += time.perf_counter_ns() - self._start
+            self._start = None
+            self.collections[info['generation']] += 1
+            self.collected += info['collected']
+            self.uncollectable += info['uncollectable']
+    
+    def __enter__(self):
+        gc.callbacks.append(self.callback)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        gc.callbacks.remove(self.callback)
+    
+    @property
+    def pause(self):
+        """Total time spent collecting, in seconds."""
+        return self.pause_ns / 1e9
@@ -0,0 +1,116 @@
+"""Live view of results while the benchmark is running."""
+
+
+__all__ = [
+    'OnlineStats',
+    'LiveAggregator',
+    'LivePlotter',
+]
+
+
+import math
+import time
+
+from frexp.extractor import get_keyfunc
+
+
+class OnlineStats:
+    
+    """Running count, mean, and standard deviation of a sequence of
+    values, updated in constant time per value (Welford's algorithm).
+    """
+    
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        """Sum of squared differences from the current mean."""
+    
+    def add(self, y):
+        self.n += 1
+        delta = y - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (y - self.mean)
+    
+    @property
+    def std(self):
+        """Population standard deviation, as computed by np.std()."""
+        return math.sqrt(self.m2 / self.n) if self.n > 0 else 0.0
+
+
+class LiveAggregator:
+    
+    """Incrementally aggregate datapoints into plotdata, using the
+    series, series key, and projections of a (single-metric) extractor.
+    Error deltas are one standard deviation.
+    """
+    
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self.keyfunc = get_keyfunc(getattr(extractor, 'series_key',
+                                           'prog'))
+        self.stats = {}
+        """Map from sid to map from x to OnlineStats."""
+    
+    def add(self, datapoint):
+        sid = self.keyfunc(datapoint)
+        x = self.extractor.project_x(datapoint)
+        y = self.extractor.project_y(datapoint)
+        self.stats.setdefault(sid, {}).setdefault(x, OnlineStats()).add(y)
+    
+    def get_plotdata(self):
+        ext = self.extractor
+        series = []
+        for sid, dispname, color, style in ext.series:
+            cells = self.stats.get(sid, {})
+            data = [(x, s.mean, s.std, s.std)
+                    for x, s in sorted(cells.items())]
+            series.append(ext.make_series(sid, dispname, color, style, data))
+        return ext.make_plotdata([ext.make_axes(series)])
+
+
+class LivePlotter:
+    
+    """Runner listener that keeps a figure of the aggregated series
+    up to date while trials run. Redraws are throttled to at most one
+    per refresh_interval seconds.
+    """
+    
+    refresh_interval = 2.0
+    
+    figure_name = 'frexp live'
+    
+    def __init__(self, extractor, refresh_interval=None):
+        self.aggregator = LiveAggregator(extractor)
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+        self.last_draw = None
+        self.pending = False
+    
+    def redraw(self):
+        # Delay the import so matplotlib is only needed when used.
+        import matplotlib.pyplot as plt
+        from .plot.drawfig import do_plot
+        
+        plt.figure(self.figure_name)
+        plt.clf()
+        do_plot(self.aggregator.get_plotdata())
+        # Let the GUI event loop process the update.
+        plt.pause(0.001)
+        self.last_draw = time.monotonic()
+        self.pending = False
+    
+    def __call__(self, datapoint):
+        """Called with each new datapoint, and with None when the
+        benchmark finishes.
+        """
+        if datapoint is None:
+            if self.pending:
+                self.redraw()
+            return
+        
+        self.aggregator.add(datapoint)
+        self.pending = True
+        if (self.last_draw is None or
+            time.monotonic() - self.last_draw >= self.refresh_interval):
+            self.redraw()
@@ -0,0 +1,91 @@
+"""Memory measurement for drivers."""
+
+
+__all__ = [
+    'RSSSampler',
+    'AllocationTracer',
+]
+
+
+import threading
+import tracemalloc
+
+from frexp.util import get_mem_usage
+
+
+class RSSSampler:
+    
+    """Context manager that samples the resident set size of this
+    process in a background thread every interval seconds, tracking
+    the peak. Sampling perturbs timing, so use it around untimed code.
+    """
+    
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.start_rss = None
+        """RSS in bytes on entry."""
+        self.peak_rss = None
+        """Largest RSS in bytes seen, including on entry and exit."""
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def sample(self):
+        rss = get_mem_usage()
+        self.samples += 1
+        if self.peak_rss is None or rss > self.peak_rss:
+            self.peak_rss = rss
+    
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+    
+    def __enter__(self):
+        self.samples = 0
+        self.peak_rss = None
+        self.sample()
+        self.start_rss = self.peak_rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+    
+    @property
+    def delta(self):
+        """Growth of the peak over the RSS on entry, in bytes."""
+        return self.peak_rss - self.start_rss
+
+
+class AllocationTracer:
+    
+    """Context manager that traces Python memory allocations with
+    tracemalloc, recording the peak and net bytes allocated within
+    the region. Much slower than untraced code, so use it around
+    untimed code.
+    """
+    
+    def __init__(self):
+        self.peak = None
+        """Peak traced bytes above those traced on entry."""
+        self.net = None
+        """Traced bytes still allocated on exit, relative to entry."""
+    
+    def __enter__(self):
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._base, _ = tracemalloc.get_traced_memory()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started:
+            tracemalloc.stop()
+        self.peak = peak - self._base
+        self.net = current - self._base
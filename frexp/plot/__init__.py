@@ -4,4 +4,5 @@ with matplotlib.
 
 
 # Exports.
-from .drawfig import draw_figure, save_figure
+from .drawfig import (draw_figure, save_figure, save_figures,
+                      render_many, is_headless)
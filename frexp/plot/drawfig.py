@@ -2,14 +2,20 @@
 
 
 import math
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
+from matplotlib.patches import Patch
+from matplotlib.text import Text
+from matplotlib import patheffects
 from matplotlib.ticker import MaxNLocator, FixedLocator, ScalarFormatter
 
 import numpy as np
 
+from ..decimate import decimate
 from .lineselector import add_lineselector
 
 
@@ -128,6 +134,10 @@ def do_series(ser):
     hollow_markers = ser['hollow_markers']
     dashes = ser['dashes']
     data = ser['data']
+    decimation = ser.get('decimation', None)
+    if decimation is not None:
+        method, n = decimation
+        data = decimate(data, method, n)
     if len(data) == 0:
         return None, None
     unzipped = list(zip(*data))
@@ -181,48 +191,127 @@ def do_series(ser):
         # plot lines and legend entries, both of which would screw up
         # the lineselector.
         plt.errorbar(xs, ys, yerr=(lowerrs, hierrs),
-                     ecolor=color, fmt=None, label='_nolegend_')
+                     ecolor=color, fmt='none', label='_nolegend_')
     
     return leg_artist, name
 
 
+xkcd_fonts = ['xkcd', 'xkcd Script', 'Humor Sans', 'Comic Neue',
+              'Comic Sans MS']
+
 class Plot:
     
     def __init__(self, data):
         self.data = data
-        self.line_cid = None
-        self.xkcd_cid = None
+        self.cids = []
         self.xkcd = False
+        self.fonts = {}
+        """Map from Text artist to its font family before xkcd
+        styling was applied.
+        """
     
-    def replot(self):
-        """Plot or replot the data, replacing the lineselector."""
-        if self.line_cid is not None:
-            plt.gcf().canvas.mpl_disconnect(self.line_cid)
-        if self.xkcd_cid is not None:
-            plt.gcf().canvas.mpl_disconnect(self.xkcd_cid)
+    def replot(self, interactive=True):
+        """Plot or replot the data, replacing the lineselector.
+        If interactive is False, don't attach any event handlers.
+        """
+        for cid in self.cids:
+            plt.gcf().canvas.mpl_disconnect(cid)
+        self.cids = []
+        self.fonts = {}
         plt.clf()
         
         do_plot(self.data, self.xkcd)
+        if not interactive:
+            return
         plt.gcf().canvas.draw()
         
-        self.line_cid = add_lineselector(plt.gcf())
-        self.xkcd_cid = self.add_xkcd(plt.gcf())
+        self.cids.extend(add_lineselector(plt.gcf()))
+        self.cids.append(self.add_xkcd(plt.gcf()))
+    
+    def set_xkcd_style(self, figure, on):
+        """Switch an xkcd-like sketch style on or off by restyling
+        the figure's existing artists, without replotting. This
+        approximates plt.xkcd(), which only applies to new artists.
+        """
+        effects = ([patheffects.withStroke(linewidth=4, foreground='w')]
+                   if on else [])
+        for artist in figure.findobj(lambda a: isinstance(a, (Line2D,
+                                                               Patch))):
+            if on:
+                artist.set_sketch_params(1, 100, 2)
+            else:
+                artist.set_sketch_params(None)
+        for line in figure.findobj(Line2D):
+            line.set_path_effects(effects)
+        for text in figure.findobj(Text):
+            text.set_path_effects(effects)
+            if on:
+                self.fonts.setdefault(text, text.get_fontfamily())
+                text.set_fontfamily(xkcd_fonts)
+            elif text in self.fonts:
+                text.set_fontfamily(self.fonts.pop(text))
     
     def add_xkcd(self, figure):
         def handler(event):
             k = event.key
             if k == 'x':
                 self.xkcd = not self.xkcd
-                self.replot()
+                self.set_xkcd_style(figure, self.xkcd)
+                figure.canvas.draw_idle()
         return figure.canvas.mpl_connect('key_press_event', handler)
 
-def draw_figure(plotdata):
-    """Plot the given data and show the figure, with a lineselector."""
+non_interactive_backends = ['agg', 'cairo', 'pdf', 'pgf', 'ps', 'svg',
+                            'template']
+
+def is_headless():
+    """Return True if matplotlib is using a non-interactive backend."""
+    return matplotlib.get_backend().lower() in non_interactive_backends
+
+def draw_figure(plotdata, out_filenames=()):
+    """Plot the given data, save it to each of the given files, and
+    show the figure, with a lineselector. The plot is only rendered
+    once for both.
+    """
     plot = Plot(plotdata)
     plot.replot()
+    for out_filename in out_filenames:
+        plt.gcf().savefig(out_filename)
     plt.show()
 
+def save_figures(plotdata, outputs, format=None):
+    """Render the plot once, without interactive handlers, and save
+    it to each of the given filenames or file objects. The format is
+    given by format, or else taken from each filename's extension.
+    """
+    fig = plt.figure()
+    try:
+        Plot(plotdata).replot(interactive=False)
+        for output in outputs:
+            fig.savefig(output, format=format)
+    finally:
+        plt.close(fig)
+
 def save_figure(plotdata, out_filename):
-    plot = Plot(plotdata)
-    plot.replot()
-    plt.savefig(out_filename)
+    save_figures(plotdata, [out_filename])
+
+def _init_render_worker():
+    matplotlib.use('Agg')
+
+def _render_job(job):
+    plotdata_filename, out_filenames = job
+    with open(plotdata_filename, 'rb') as in_file:
+        plotdata = pickle.load(in_file)
+    save_figures(plotdata, out_filenames)
+
+def render_many(jobs, workers=None, render=_render_job):
+    """Render many figures in parallel worker processes using the
+    Agg backend. jobs is a list of (plotdata filename, list of output
+    filenames) pairs. workers defaults to the number of CPUs.
+    
+    Alternatively, render may be a pickleable function to call on
+    each job in a worker instead. The list of its results is returned.
+    """
+    with ProcessPoolExecutor(workers,
+                             initializer=_init_render_worker) as executor:
+        # Consuming the results also propagates exceptions.
+        return list(executor.map(render, jobs))
@@ -56,10 +56,19 @@ class SelectorCursor(object):
 class LineSelector:
     """Utility class for modifying matplotlib artists to highlight
     selected series.
+    
+    When the canvas supports blitting, the highlight is never applied
+    to the artists persistently. Instead, a copy of the unhighlighted
+    figure is cached after each full draw, and changing the selection
+    just restores that copy and draws the highlighted artists on top.
+    Otherwise, the artists are modified and the whole figure is
+    redrawn.
     """
     
-    def __init__(self, axes_list):
-        """Construct to select from among lines of the given axes."""
+    def __init__(self, axes_list, figure=None):
+        """Construct to select from among lines of the given axes.
+        If figure is given and its canvas supports it, use blitting.
+        """
         # Matplotlib artists that need to be updated.
         self.lines = []
         self.leglines = []
@@ -83,32 +92,69 @@ class LineSelector:
             self.leglines.extend(new_leglines)
             self.legtexts.extend(new_legtexts)
         
+        self.figure = figure
+        self.blit = (figure is not None and
+                     getattr(figure.canvas, 'supports_blit', False))
+        self.background = None
+        """Copy of the unhighlighted figure, for blitting."""
+        
         self.cursor = SelectorCursor(
                 len(self.lines), self.markLine, self.unmarkLine)
     
-    def markLine(self, i, active):
-        if i == None:
-            return
+    def set_highlight(self, i, on):
         line = self.lines[i]
         legline = self.leglines[i]
         legtext = self.legtexts[i]
         
-        line.set_zorder(3)
-        line.set_linewidth(3.0)
-        legline.set_linewidth(3.0)
-        legtext.set_color('blue')
+        line.set_zorder(3 if on else 2)
+        line.set_linewidth(3.0 if on else 1.0)
+        legline.set_linewidth(3.0 if on else 1.0)
+        legtext.set_color('blue' if on else 'black')
+    
+    def markLine(self, i, active):
+        if i == None or self.blit:
+            return
+        self.set_highlight(i, True)
     
     def unmarkLine(self, i, active):
-        if i == None:
+        if i == None or self.blit:
+            return
+        self.set_highlight(i, False)
+    
+    def draw_highlight(self):
+        """Draw the selected series' artists, highlighted, on top of
+        the current canvas contents, leaving the artists unchanged.
+        """
+        i = self.cursor.cursor
+        if i is None:
             return
         line = self.lines[i]
         legline = self.leglines[i]
         legtext = self.legtexts[i]
-        
-        line.set_zorder(2)
-        line.set_linewidth(1.0)
-        legline.set_linewidth(1.0)
-        legtext.set_color('black')
+        saved = (line.get_zorder(), line.get_linewidth(),
+                 legline.get_linewidth(), legtext.get_color())
+        self.set_highlight(i, True)
+        try:
+            for artist in [line, legline, legtext]:
+                self.figure.draw_artist(artist)
+        finally:
+            line.set_zorder(saved[0])
+            line.set_linewidth(saved[1])
+            legline.set_linewidth(saved[2])
+            legtext.set_color(saved[3])
+    
+    def draw_handler(self, event):
+        """After a full draw, cache the background and overlay the
+        highlight. Draws done by savefig, possibly on a temporary
+        canvas of another type, are left alone, so that saved files
+        don't include the selection.
+        """
+        canvas = event.canvas
+        if (canvas is not self.figure.canvas or canvas.is_saving() or
+            not hasattr(canvas, 'copy_from_bbox')):
+            return
+        self.background = canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_highlight()
     
     def handler(self, event):
         k = event.key
@@ -121,17 +167,27 @@ class LineSelector:
         if k not in actionmap:
             return
         actionmap[k]()
-        event.canvas.draw()
+        if self.blit and self.background is not None:
+            event.canvas.restore_region(self.background)
+            self.draw_highlight()
+            event.canvas.blit(self.figure.bbox)
+        else:
+            event.canvas.draw()
 
 
 def add_lineselector(figure):
     """Add a line selector for all axes of the given figure.
-    Return the mpl connection id for disconnection later.
+    Return the list of mpl connection ids for disconnection later.
     """
-    lineselector = LineSelector(figure.get_axes())
+    lineselector = LineSelector(figure.get_axes(), figure)
     # Workaround for weird Heisenbug. The handler isn't reliably called
     # when it's a bound method, but is called if I use a wrapper for
     # some reason.
     def wrapper(event):
         lineselector.handler(event)
-    return figure.canvas.mpl_connect('key_press_event', wrapper)
+    def draw_wrapper(event):
+        lineselector.draw_handler(event)
+    cids = [figure.canvas.mpl_connect('key_press_event', wrapper)]
+    if lineselector.blit:
+        cids.append(figure.canvas.mpl_connect('draw_event', draw_wrapper))
+    return cids
@@ -0,0 +1,106 @@
+"""Unit tests for drawfig.py."""
+
+
+import unittest
+import os
+import io
+import pickle
+import tempfile
+from unittest import mock
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from frexp.workflow import Workflow
+from frexp.extractor import MetricExtractor
+from frexp.plot import drawfig
+from frexp.plot.drawfig import (do_plot, draw_figure, save_figures,
+                                render_many, is_headless)
+
+
+def make_plotdata(**attrs):
+    """Make plotdata for two series of ten points, via an extractor."""
+    class E(MetricExtractor):
+        metric = 'time'
+        series = [('a', 'A', 'red', '- o normal'),
+                  ('b', 'B', 'blue', '-- s normal')]
+    for key, value in attrs.items():
+        setattr(E, key, value)
+    e = E(Workflow(fout=io.StringIO()))
+    e.data = [{'dsparams': {'x': x}, 'prog': prog,
+               'results': {'time': x * (2 if prog == 'b' else 1)}}
+              for prog in ['a', 'b'] for x in range(10)]
+    return e.get_plotdata()
+
+
+class DrawfigCase(unittest.TestCase):
+    
+    def tearDown(self):
+        plt.close('all')
+    
+    def test_is_headless(self):
+        self.assertTrue(is_headless())
+        with mock.patch('matplotlib.get_backend', return_value='TkAgg'):
+            self.assertFalse(is_headless())
+    
+    def test_save_figures(self):
+        plotdata = make_plotdata()
+        with tempfile.TemporaryDirectory() as d:
+            fns = [os.path.join(d, 'plot.png'), os.path.join(d, 'plot.pdf')]
+            with mock.patch.object(drawfig, 'do_plot',
+                                   wraps=drawfig.do_plot) as do_plot:
+                save_figures(plotdata, fns)
+            # Rendered once for both formats.
+            self.assertEqual(do_plot.call_count, 1)
+            for fn in fns:
+                self.assertGreater(os.path.getsize(fn), 0)
+            with open(fns[0], 'rb') as f:
+                self.assertEqual(f.read(4), b'\x89PNG')
+            with open(fns[1], 'rb') as f:
+                self.assertEqual(f.read(4), b'%PDF')
+        
+        buf = io.StringIO()
+        save_figures(plotdata, [buf], format='svg')
+        self.assertIn('<svg', buf.getvalue())
+        self.assertEqual(plt.get_fignums(), [])
+    
+    def test_draw_figure(self):
+        plotdata = make_plotdata()
+        with tempfile.TemporaryDirectory() as d:
+            # Saved together, as Plotter does.
+            fns = [os.path.join(d, 'plot.png'), os.path.join(d, 'plot.pdf')]
+            with mock.patch.object(drawfig, 'do_plot',
+                                   wraps=drawfig.do_plot) as do_plot:
+                draw_figure(plotdata, fns)
+            # The shown figure is the saved one.
+            self.assertEqual(do_plot.call_count, 1)
+            for fn in fns:
+                self.assertGreater(os.path.getsize(fn), 0)
+    
+    def test_render_many(self):
+        with tempfile.TemporaryDirectory() as d:
+            jobs = []
+            for i in range(2):
+                plotdata_fn = os.path.join(d, 'plotdata{}.pickle'.format(i))
+                with open(plotdata_fn, 'wb') as f:
+                    pickle.dump(make_plotdata(title=str(i)), f)
+                jobs.append((plotdata_fn,
+                             [os.path.join(d, 'plot{}.png'.format(i)),
+                              os.path.join(d, 'plot{}.svg'.format(i))]))
+            render_many(jobs, workers=2)
+            for _, fns in jobs:
+                for fn in fns:
+                    self.assertGreater(os.path.getsize(fn), 0)
+    
+    def test_decimation(self):
+        plotdata = make_plotdata(decimation=('lttb', 4))
+        plt.figure()
+        do_plot(plotdata)
+        lines = [line for line in plt.gca().get_lines()
+                 if line.get_label() != '_nolegend_']
+        self.assertEqual([len(line.get_xdata()) for line in lines], [4, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
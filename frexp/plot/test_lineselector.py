@@ -0,0 +1,128 @@
+"""Unit tests for lineselector.py and the xkcd toggle of drawfig.py."""
+
+
+import unittest
+import io
+from unittest import mock
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.backend_bases import KeyEvent
+from matplotlib.lines import Line2D
+
+from frexp.workflow import Workflow
+from frexp.extractor import MetricExtractor
+from frexp.plot import drawfig
+from frexp.plot.drawfig import Plot, do_plot, xkcd_fonts
+from frexp.plot.lineselector import LineSelector
+
+
+def make_plotdata():
+    class E(MetricExtractor):
+        metric = 'time'
+        series = [('a', 'A', 'red', '- o normal'),
+                  ('b', 'B', 'blue', '- s normal'),
+                  ('c', 'C', 'green', '- ^ normal')]
+    e = E(Workflow(fout=io.StringIO()))
+    e.data = [{'dsparams': {'x': x}, 'prog': prog,
+               'results': {'time': x * i}}
+              for i, prog in enumerate(['a', 'b', 'c'], 1)
+              for x in range(1, 4)]
+    return e.get_plotdata()
+
+
+def press(figure, key):
+    event = KeyEvent('key_press_event', figure.canvas, key)
+    figure.canvas.callbacks.process('key_press_event', event)
+
+
+def get_lines(figure):
+    return [line for line in figure.get_axes()[0].get_lines()
+            if line.get_label() != '_nolegend_']
+
+
+class LineSelectorCase(unittest.TestCase):
+    
+    def setUp(self):
+        plt.figure()
+        self.plot = Plot(make_plotdata())
+        self.plot.replot()
+        self.figure = plt.gcf()
+    
+    def tearDown(self):
+        plt.close('all')
+    
+    def test_blit(self):
+        figure = self.figure
+        lines = get_lines(figure)
+        self.assertEqual(len(lines), 3)
+        widths = [line.get_linewidth() for line in lines]
+        # A full draw caches the background.
+        figure.canvas.draw()
+        
+        for key, expected in [('down', [(0, 3.0)]), ('down', [(1, 3.0)]),
+                              ('up', [(0, 3.0)]), ('up', [])]:
+            drawn = []
+            def draw_artist(artist, drawn=drawn):
+                if artist in lines:
+                    drawn.append((lines.index(artist),
+                                  artist.get_linewidth()))
+            with mock.patch.object(figure, 'draw_artist', draw_artist):
+                press(figure, key)
+            self.assertEqual(drawn, expected)
+            # The highlight is blitted, not left on the artists.
+            self.assertEqual([line.get_linewidth() for line in lines],
+                             widths)
+        
+        # Saving doesn't overlay the selection, on any canvas type.
+        press(figure, 'down')
+        with mock.patch.object(LineSelector, 'draw_highlight') as dh:
+            for format in ['png', 'pdf', 'svg']:
+                figure.savefig(io.BytesIO(), format=format)
+            self.assertEqual(dh.call_count, 0)
+            figure.canvas.draw()
+            self.assertEqual(dh.call_count, 1)
+    
+    def test_no_blit(self):
+        figure = self.figure
+        lines = get_lines(figure)
+        selector = LineSelector(figure.get_axes())
+        self.assertFalse(selector.blit)
+        # Unhighlighting restores this width.
+        for line in lines:
+            line.set_linewidth(1.0)
+        def handle(key):
+            selector.handler(KeyEvent('key_press_event', figure.canvas, key))
+            return [line.get_linewidth() for line in lines]
+        self.assertEqual(handle('down'), [3.0, 1.0, 1.0])
+        self.assertEqual(handle('down'), [1.0, 3.0, 1.0])
+        self.assertEqual(handle('up'), [3.0, 1.0, 1.0])
+        # Ten back, wrapping around through None.
+        self.assertEqual(handle('pageup'), [1.0, 1.0, 3.0])
+        self.assertEqual(handle('left'), [1.0, 1.0, 3.0])
+    
+    def test_xkcd_toggle(self):
+        figure = self.figure
+        lines = get_lines(figure)
+        texts = figure.get_axes()[0].get_legend().get_texts()
+        family = texts[0].get_fontfamily()
+        
+        with mock.patch.object(drawfig, 'do_plot', wraps=do_plot) as dp:
+            press(figure, 'x')
+            # Restyled in place, without replotting.
+            self.assertEqual(dp.call_count, 0)
+            self.assertEqual(get_lines(figure), lines)
+            self.assertTrue(self.plot.xkcd)
+            self.assertIsNotNone(lines[0].get_sketch_params())
+            self.assertEqual(texts[0].get_fontfamily(), xkcd_fonts)
+            
+            press(figure, 'x')
+            self.assertEqual(dp.call_count, 0)
+            self.assertFalse(self.plot.xkcd)
+            self.assertIsNone(lines[0].get_sketch_params())
+            self.assertEqual(texts[0].get_fontfamily(), family)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Capturing and aggregating profiles of benchmark trials."""
+
+
+__all__ = [
+    'ProfilingDriver',
+    'top_functions',
+    'collapsed_stacks',
+    'ProfileAggregator',
+]
+
+
+import os
+import pickle
+import cProfile
+import pstats
+
+from frexp.workflow import Task
+from frexp.extractor import get_keyfunc
+
+
+class ProfilingDriver:
+    
+    """Wrapper for a driver, called in the child process, that runs
+    the driver under cProfile and saves the profile to a file.
+    """
+    
+    def __init__(self, driver, profile_fn):
+        self.driver = driver
+        self.profile_fn = profile_fn
+    
+    def __call__(self, pipe_fn):
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(self.driver, pipe_fn)
+        finally:
+            profiler.dump_stats(self.profile_fn)
+
+
+def func_name(func):
+    filename, line, name = func
+    if filename == '~':
+        # Builtin.
+        return name
+    return '{}:{}({})'.format(os.path.basename(filename), line, name)
+
+
+def top_functions(stats, n=20, sort='cumulative'):
+    """Given a pstats.Stats, return a list of dicts describing the n
+    functions with the largest cumulative (or, if sort is 'tottime',
+    own) time.
+    """
+    assert sort in ['cumulative', 'tottime']
+    rows = []
+    for func, (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append(dict(
+            function = func_name(func),
+            ncalls = nc,
+            tottime = tt,
+            cumtime = ct,
+        ))
+    key = 'cumtime' if sort == 'cumulative' else 'tottime'
+    rows.sort(key=lambda r: -r[key])
+    return rows[:n]
+
+
+def collapsed_stacks(stats):
+    """Given a pstats.Stats, return lines of collapsed-stack flamegraph
+    input ("frame;frame weight"), with weights in microseconds of own
+    time. cProfile only records callers one level up, so each line is
+    a caller;callee pair (or just the function, for its time when
+    called from the top level).
+    """
+    lines = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        name = func_name(func)
+        attributed = 0
+        for caller, (_cc, _nc, caller_tt, _ct) in callers.items():
+            us = int(round(caller_tt * 1e6))
+            attributed += caller_tt
+            if us > 0:
+                lines.append('{};{} {}'.format(func_name(caller), name, us))
+        rest = int(round((tt - attributed) * 1e6))
+        if rest > 0:
+            lines.append('{} {}'.format(name, rest))
+    lines.sort()
+    return lines
+
+
+class ProfileAggregator(Task):
+    
+    """Merge the profiles captured for each (prog, x) cell (see
+    ExpWorkflow.profile_trials), print their top functions, and write
+    collapsed-stack files for flamegraph tools to the profiles
+    directory.
+    """
+    
+    group_key = ('dsparams', 'x')
+    """Key (see extractor.get_keyfunc()) grouping a prog's profiles."""
+    
+    top_n = 15
+    
+    sort = 'cumulative'
+    """Order of top functions, 'cumulative' or 'tottime'."""
+    
+    def get_groups(self, datapoints):
+        """Return a map from (prog, x) to sorted list of profile
+        filenames.
+        """
+        keyfunc = get_keyfunc(self.group_key)
+        groups = {}
+        for p in datapoints:
+            fn = p.get('profile', None)
+            if fn is not None and os.path.exists(fn):
+                groups.setdefault((p['prog'], keyfunc(p)), set()).add(fn)
+        return {k: sorted(fns) for k, fns in groups.items()}
+    
+    def get_collapsed_filename(self, prog, x):
+        return (self.workflow.profiles_dirname +
+                'collapsed_{}_{}.txt'.format(prog, x))
+    
+    def run(self):
+        with open(self.workflow.data_filename, 'rb') as in_file:
+            datapoints = pickle.load(in_file)
+        groups = self.get_groups(datapoints)
+        if len(groups) == 0:
+            self.print('No profiles captured.')
+            return
+        
+        self.summaries = {}
+        for (prog, x), fns in sorted(groups.items(),
+                                     key=lambda item: str(item[0])):
+            stats = pstats.Stats(*fns)
+            top = top_functions(stats, self.top_n, self.sort)
+            self.summaries[(prog, x)] = top
+            
+            self.print('{} @ {} ({} profiles, {:.3f}s total)'.format(
+                       prog, x, len(fns), stats.total_tt))
+            self.print('  {:>9} {:>10} {:>10}  {}'.format(
+                       'ncalls', 'tottime', 'cumtime', 'function'))
+            for r in top:
+                self.print('  {:>9} {:>10.4f} {:>10.4f}  {}'.format(
+                           r['ncalls'], r['tottime'], r['cumtime'],
+                           r['function']))
+            
+            with open(self.get_collapsed_filename(prog, x), 'wt') as f:
+                f.write('\n'.join(collapsed_stacks(stats)) + '\n')
+        
+        self.print('Done.')
@@ -0,0 +1,185 @@
+"""Static HTML report spanning many experiments."""
+
+
+__all__ = [
+    'Report',
+]
+
+
+import os
+import io
+import pickle
+import time
+import html
+
+from frexp.util import fingerprint, file_digest
+from frexp.extractor import axes_csvdata
+
+
+def render_svg(plotdata):
+    """Render plotdata to an SVG string suitable for inlining in HTML."""
+    # Delay the import so that matplotlib is only needed when used.
+    from .plot import save_figures
+    
+    buf = io.StringIO()
+    save_figures(plotdata, [buf], format='svg')
+    svg = buf.getvalue()
+    # Drop the XML prolog and doctype.
+    return svg[svg.index('<svg'):]
+
+
+def format_value(v):
+    if v is None:
+        return ''
+    if isinstance(v, float):
+        return '{:.6g}'.format(v)
+    return str(v)
+
+
+def render_table(header, rows):
+    parts = ['<table>', '<tr>']
+    parts.extend('<th>{}</th>'.format(html.escape(str(h))) for h in header)
+    parts.append('</tr>')
+    for row in rows:
+        parts.append('<tr>')
+        parts.extend('<td>{}</td>'.format(
+                     html.escape(format_value(row.get(h, None))))
+                     for h in header)
+        parts.append('</tr>')
+    parts.append('</table>')
+    return ''.join(parts)
+
+
+def render_section(args):
+    """Return the HTML for one experiment's section. Runs in a worker
+    process.
+    """
+    anchor, name, plotdata_filename, metadata = args
+    with open(plotdata_filename, 'rb') as in_file:
+        plotdata = pickle.load(in_file)
+    
+    parts = ['<section id="{}">'.format(anchor),
+             '<h2>{}</h2>'.format(html.escape(name)),
+             '<div class="plot">{}</div>'.format(render_svg(plotdata))]
+    for i, ax in enumerate(plotdata['axes']):
+        title = ax['axes_title'] or (name if len(plotdata['axes']) == 1
+                                     else str(i))
+        parts.append('<h3>{}</h3>'.format(html.escape(title)))
+        parts.append(render_table(*axes_csvdata(ax)))
+    if metadata:
+        parts.append('<h3>Metadata</h3>')
+        parts.append(render_table(['key', 'value'],
+                                  [{'key': k, 'value': v}
+                                   for k, v in sorted(metadata.items())]))
+    parts.append('</section>')
+    return '\n'.join(parts)
+
+
+style = '''
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin: 0.5em 0 1.5em 0; }
+th, td { border: 1px solid #ccc; padding: 2px 8px; text-align: right; }
+section { border-top: 1px solid #888; margin-top: 2em; }
+.plot svg { max-width: 100%; height: auto; }
+'''
+
+
+class Report:
+    
+    """Builder for a single self-contained HTML report with a section
+    per experiment: an inline SVG plot, the data table of each axes,
+    and run metadata.
+    
+    Sections are cached next to the output file, keyed on the
+    contents of their plotdata file and their metadata, so rebuilding
+    only re-renders experiments that changed. Changed sections are
+    rendered in parallel worker processes.
+    """
+    
+    def __init__(self, out_filename, title='Benchmark report',
+                 workers=None):
+        self.out_filename = out_filename
+        self.title = title
+        self.workers = workers
+        """Number of worker processes, defaulting to the CPU count."""
+        self.entries = []
+        """List of (name, plotdata filename, metadata dict)."""
+    
+    @property
+    def cache_filename(self):
+        return self.out_filename + '.cache.pickle'
+    
+    def add(self, name, plotdata_filename, metadata=None):
+        """Add a section for the given plotdata file."""
+        self.entries.append((name, plotdata_filename, metadata or {}))
+    
+    def add_workflow(self, workflow, name=None, metadata=None):
+        """Add a section for an ExpWorkflow's extracted plotdata,
+        recording its file prefix and the time of its data file.
+        """
+        if name is None:
+            name = type(workflow).__name__
+        md = {'prefix': workflow.prefix}
+        try:
+            mtime = os.stat(workflow.data_filename).st_mtime
+            md['data time'] = time.strftime('%Y-%m-%d %H:%M:%S',
+                                            time.localtime(mtime))
+        except FileNotFoundError:
+            pass
+        md.update(metadata or {})
+        self.add(name, workflow.plotdata_filename, md)
+    
+    def build(self):
+        """Write the report. Return the number of sections that had
+        to be re-rendered.
+        """
+        try:
+            with open(self.cache_filename, 'rb') as in_file:
+                cache = pickle.load(in_file)
+        except FileNotFoundError:
+            cache = {}
+        
+        jobs = []
+        keys = []
+        for i, (name, plotdata_filename, metadata) in \
+                enumerate(self.entries):
+            anchor = 'exp{}'.format(i)
+            key = fingerprint(file_digest(plotdata_filename), anchor,
+                              name, sorted(metadata.items()))
+            keys.append(key)
+            if key not in cache:
+                jobs.append((key, (anchor, name, plotdata_filename,
+                                   metadata)))
+        
+        if len(jobs) > 1 and self.workers != 1:
+            from .plot import render_many
+            sections = render_many([args for _, args in jobs],
+                                   self.workers, render=render_section)
+        else:
+            sections = [render_section(args) for _, args in jobs]
+        for (key, _), section in zip(jobs, sections):
+            cache[key] = section
+        
+        toc = ['<li><a href="#exp{}">{}</a></li>'.format(
+               i, html.escape(name))
+               for i, (name, _, _) in enumerate(self.entries)]
+        doc = [
+            '<!DOCTYPE html>',
+            '<html><head><meta charset="utf-8">',
+            '<title>{}</title>'.format(html.escape(self.title)),
+            '<style>{}</style>'.format(style),
+            '</head><body>',
+            '<h1>{}</h1>'.format(html.escape(self.title)),
+            '<ul>', *toc, '</ul>',
+            *(cache[key] for key in keys),
+            '</body></html>',
+        ]
+        with open(self.out_filename, 'wt', encoding='utf-8') as out_file:
+            out_file.write('\n'.join(doc))
+        
+        # Only keep sections that are still in the report.
+        cache = {key: cache[key] for key in keys}
+        with open(self.cache_filename, 'wb') as out_file:
+            pickle.dump(cache, out_file)
+        
+        return len(jobs)
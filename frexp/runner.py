@@ -8,12 +8,19 @@ __all__ = [
 
 import pickle
 import os
+import glob
+import io
+import time
+import threading
 from multiprocessing import Process
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 from frexp.util import on_battery_power
 from frexp.workflow import Task
+from frexp.verifier import DigestingDriver
+from frexp.profiling import ProfilingDriver
 
 
 class Runner(Task):
@@ -22,34 +29,100 @@ class Runner(Task):
     
     show_time = True
     
+    workflow_attrs = ['ExpDriver', 'stddev_window', 'min_repeats',
+                      'max_repeats', 'repeat_ylimit', 'do_repeats',
+                      'fused_verify', 'filter_progs', 'filter_dsids',
+                      'filter_xrange', 'profile_trials', 'gc_policy']
+    
+    def __init__(self, workflow):
+        super().__init__(workflow)
+        self.listeners = []
+        """Functions to call with each datapoint as soon as its trial
+        completes, and with None once all trials are done.
+        """
+        self.scheduler = None
+        """If non-None, a CoreScheduler (see suite.py) that runs each
+        driver process on a core of its own. Trials then run
+        concurrently, as many as the scheduler has cores. Listeners are
+        still called from the thread running the runner, as each trial's
+        turn comes.
+        """
+        self.local = threading.local()
+        """Per-thread state of concurrently running trials: the pipe
+        filename, a buffer for status output, and a list of datapoints
+        not yet passed to the listeners.
+        """
+        self.print = self.print_trial
+    
+    def print_trial(self, *args, **kargs):
+        """Print status output, to the current trial's buffer if trials
+        are running concurrently.
+        """
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            kargs.setdefault('file', buffer)
+        self.workflow.print(*args, **kargs)
+    
+    def notify(self, datapoint):
+        """Call the listeners with datapoint, or queue it if trials are
+        running concurrently.
+        """
+        pending = getattr(self.local, 'pending', None)
+        if pending is not None:
+            pending.append(datapoint)
+            return
+        for listener in self.listeners:
+            listener(datapoint)
+    
     # Each invocation of the driver is done as a separate process,
     # so that there is no chance of contamination between tests.
     
     ### TODO: Optimize to pass in dsid directly to child,
     ### instead of copying from ds file to pipe.
     
-    def dispatch_test(self, dataset, prog, other_tparams):
-        """Spawn a driver process and get its result."""
+    def dispatch_test(self, dataset, prog, other_tparams, *,
+                      verify=False, profile_fn=None):
+        """Spawn a driver process and get its result. If verify is
+        True, ask the driver for its output as well, and have it
+        digested in the child. If profile_fn is given, run the driver
+        under cProfile and save the profile there.
+        """
         # Communicate the dataset and results via a temporary
         # pipe file.
-        pipe_fn = self.workflow.pipe_filename
+        pipe_fn = getattr(self.local, 'pipe_fn', None)
+        if pipe_fn is None:
+            pipe_fn = self.workflow.pipe_filename
+        target = self.workflow.ExpDriver
+        if verify:
+            other_tparams = dict(other_tparams, verify_output=True,
+                                 digest_output=True)
+            target = DigestingDriver(target)
+        if self.workflow.gc_policy is not None:
+            other_tparams = dict(other_tparams,
+                                 gc_policy=self.workflow.gc_policy)
+        if profile_fn is not None:
+            target = ProfilingDriver(target, profile_fn)
         with open(pipe_fn, 'wb') as pf:
             pickle.dump((dataset, prog, other_tparams), pf)
         
-        child = Process(target=self.workflow.ExpDriver, args=(pipe_fn,))
-        child.start()
-        
-        child.join()
-        if child.exitcode != 0:
+        if self.scheduler is not None:
+            exitcode = self.scheduler.run_process(target, (pipe_fn,))
+        else:
+            child = Process(target=target, args=(pipe_fn,))
+            child.start()
+            
+            child.join()
+            exitcode = child.exitcode
+        if exitcode != 0:
             raise ValueError('Child failed with exit code ' +
-                             str(child.exitcode))
+                             str(exitcode))
         with open(pipe_fn, 'rb') as pf:
             results = pickle.load(pf)
         
         os.remove(pipe_fn)
         return results
     
-    def run_single_test(self, trial):
+    def run_single_test(self, trial, *, verify=False):
         """Run a single execution and return its result datapoint."""
         trial = dict(trial)
         dsid = trial.pop('dsid')
@@ -59,7 +132,7 @@ class Runner(Task):
         with open(ds_fn, 'rb') as dsfile:
             dataset = pickle.load(dsfile)
         
-        results = self.dispatch_test(dataset, prog, trial)
+        results = self.dispatch_test(dataset, prog, trial, verify=verify)
         
         datapoint = {'dsparams': dataset['dsparams'],
                      'prog': prog,
@@ -67,14 +140,62 @@ class Runner(Task):
         datapoint.update(trial)
         return datapoint
     
+    def should_profile(self, trial):
+        profile_trials = self.workflow.profile_trials
+        if profile_trials is None or profile_trials is False:
+            return False
+        return profile_trials is True or profile_trials(trial)
+    
+    def profile_trial(self, trial):
+        """Run a trial once more, untimed, under the profiler. Return
+        the profile's filename.
+        """
+        trial = dict(trial)
+        dsid = trial.pop('dsid')
+        prog = trial.pop('prog')
+        with open(self.workflow.get_ds_filename(dsid), 'rb') as dsfile:
+            dataset = pickle.load(dsfile)
+        os.makedirs(self.workflow.profiles_dirname, exist_ok=True)
+        profile_fn = self.workflow.get_profile_filename(trial['tid'], prog)
+        self.dispatch_test(dataset, prog, trial, profile_fn=profile_fn)
+        return profile_fn
+    
+    def check_output(self, datapoint):
+        """Compare the output digest of datapoint against the first
+        one seen for its trial group, and report any disagreement.
+        """
+        digest = datapoint['results'].get('output_digest', None)
+        if digest is None:
+            self.print('Warning: No output from ' + datapoint['prog'] +
+                       ' to verify')
+            return
+        tid = datapoint['tid']
+        prog = datapoint['prog']
+        goalprog, goal = self.goal_digests.setdefault(tid, (prog, digest))
+        if digest != goal:
+            self.mismatches.append((tid, goalprog, prog))
+            self.print('Warning: Output disagrees for trial group {} '
+                       '(goalprog: {}, prog: {})'.format(tid, goalprog, prog))
+    
     def repeat_single_test(self, trial, itemstrlen):
         """Repeatedly run a trial until it meets the standard
         deviation and min-repeats requirements, as measured
         by 'all' seq process time. Return all datapoints.
+        
+        If workflow.fused_verify is set, the first repeat also
+        checks the trial's output.
         """
+        verify = self.workflow.fused_verify
+        
         if not self.workflow.do_repeats:
             self.print()
-            return [self.run_single_test(trial)]
+            dp = self.run_single_test(trial, verify=verify)
+            if verify:
+                self.check_output(dp)
+            self.notify(dp)
+            self.emit('convergence', tid=trial['tid'], prog=trial['prog'],
+                      repeats=1, status='single')
+            return [dp], False
         
         else:
             self.print('  ', end='')
@@ -103,14 +224,32 @@ class Runner(Task):
                     statusstr = statusstr.ljust(itemstrlen)
                     self.print('\n' + statusstr, end='')
                 self.print('. ', end='')
-                dp = self.run_single_test(trial)
+                first = len(times) == 0
+                dp = self.run_single_test(trial, verify=verify and first)
                 
                 if 'timedout' in dp['results'] and dp['results']['timedout']:
                     timedout = True
                     break
                 
+                if verify and first:
+                    self.check_output(dp)
+                
                 datapoints.append(dp)
                 times.append(dp['results']['stdmetric'])
+                self.notify(dp)
+                self.emit('repeat_done', tid=trial['tid'],
+                          prog=trial['prog'], repeat=len(times),
+                          stdmetric=times[-1], mean=float(np.mean(times)),
+                          std=float(np.std(times)), stable=stabilized())
+            
+            if timedout:
+                status = 'timedout'
+            elif len(times) == max and not stabilized():
+                status = 'max_repeats'
+            else:
+                status = 'converged'
+            self.emit('convergence', tid=trial['tid'], prog=trial['prog'],
+                      repeats=len(datapoints), status=status)
             
             if timedout:
                 if len(datapoints) > 0:
@@ -126,15 +265,120 @@ class Runner(Task):
             
             return datapoints, timedout
     
+    def run_trial(self, i, total, trial):
+        """Run the repeats of the i-th of total trials, and profile it
+        if requested. Return its datapoints and whether it timed out.
+        """
+        itemstr = 'Running test {} of {} ...'.format(i, total)
+        self.print(itemstr, end='')
+        self.emit('trial_start', index=i, total=total, tid=trial['tid'],
+                  prog=trial['prog'], dsid=trial['dsid'])
+        datapoints, timedout = self.repeat_single_test(trial, len(itemstr))
+        if len(datapoints) > 0 and self.should_profile(trial):
+            profile_fn = self.profile_trial(trial)
+            for dp in datapoints:
+                dp['profile'] = profile_fn
+        return datapoints, timedout
+    
+    def run_trial_concurrently(self, i, total, trial):
+        """As run_trial(), in a worker thread. Return its status
+        output and the datapoints to notify listeners of as well.
+        """
+        self.local.pipe_fn = self.workflow.get_pipe_filename(i)
+        self.local.buffer = buffer = io.StringIO()
+        self.local.pending = pending = []
+        try:
+            datapoints, timedout = self.run_trial(i, total, trial)
+        finally:
+            self.local.pipe_fn = self.local.buffer = None
+            self.local.pending = None
+        return datapoints, timedout, buffer.getvalue(), pending
+    
+    def iter_trials(self, tparams_list):
+        """Run the trials, yielding the datapoints and timeout flag of
+        each, in order. With a scheduler, trials run concurrently, and
+        each one's status output is printed, and its listeners called,
+        when its turn comes.
+        """
+        total = len(tparams_list)
+        if self.scheduler is None:
+            for i, trial in enumerate(tparams_list, 1):
+                yield self.run_trial(i, total, trial)
+            return
+        
+        with ThreadPoolExecutor(len(self.scheduler.cores)) as executor:
+            futures = [executor.submit(self.run_trial_concurrently,
+                                       i, total, trial)
+                       for i, trial in enumerate(tparams_list, 1)]
+            try:
+                for future in futures:
+                    datapoints, timedout, output, pending = future.result()
+                    self.print(output, end='')
+                    for datapoint in pending:
+                        self.notify(datapoint)
+                    yield datapoints, timedout
+            finally:
+                for future in futures:
+                    future.cancel()
+    
+    def get_dsparams(self, dsid):
+        ds_fn = self.workflow.get_ds_filename(dsid)
+        with open(ds_fn, 'rb') as dsfile:
+            return pickle.load(dsfile)['dsparams']
+    
+    def select_trials(self, tparams_list):
+        """Return the trials passing the workflow's filters."""
+        wf = self.workflow
+        if wf.filter_xrange is not None:
+            xmin, xmax = wf.filter_xrange
+            dsids = {t['dsid'] for t in tparams_list}
+            xs = {dsid: self.get_dsparams(dsid)['x'] for dsid in dsids}
+        
+        selected = []
+        for trial in tparams_list:
+            if (wf.filter_progs is not None and
+                trial['prog'] not in wf.filter_progs):
+                continue
+            if (wf.filter_dsids is not None and
+                trial['dsid'] not in wf.filter_dsids):
+                continue
+            if wf.filter_xrange is not None:
+                x = xs[trial['dsid']]
+                if ((xmin is not None and x < xmin) or
+                    (xmax is not None and x > xmax)):
+                    continue
+            selected.append(trial)
+        return selected
+    
+    def merge_data(self, old_datapoints, tparams_list, datapoint_list):
+        """Replace the datapoints of the given (rerun) trials in the
+        old result data with the new ones.
+        """
+        rerun = {(t['tid'], t['prog']) for t in tparams_list}
+        kept = [p for p in old_datapoints
+                if (p['tid'], p['prog']) not in rerun]
+        return kept + datapoint_list
+    
     def run_all_tests(self, tparams_list):
         """Run all test trials."""
         datapoint_list = []
-        for i, trial in enumerate(tparams_list, 1):
-            itemstr = 'Running test {} of {} ...'.format(i, len(tparams_list))
-            self.print(itemstr, end='')
-            datapoints, _timedout = self.repeat_single_test(
-                                                trial, len(itemstr))
+        total = len(tparams_list)
+        start = time.perf_counter()
+        self.emit('benchmark_start', trials=total)
+        results = self.iter_trials(tparams_list)
+        for i, (trial, (datapoints, timedout)) in enumerate(
+                zip(tparams_list, results), 1):
             datapoint_list.extend(datapoints)
+            
+            elapsed = time.perf_counter() - start
+            throughput = i / elapsed if elapsed > 0 else None
+            self.emit('trial_end', index=i, total=total, tid=trial['tid'],
+                      prog=trial['prog'], repeats=len(datapoints),
+                      timedout=timedout,
+                      throughput=throughput,
+                      eta=(total - i) / throughput if throughput else None)
+        self.emit('benchmark_end', trials=total,
+                  elapsed=time.perf_counter() - start)
         return datapoint_list
     
     def run(self):
@@ -144,15 +388,52 @@ class Runner(Task):
         with open(self.workflow.params_filename, 'rb') as in_file:
             tparams_list = pickle.load(in_file)
         
+        if self.workflow.filtering:
+            total = len(tparams_list)
+            tparams_list = self.select_trials(tparams_list)
+            self.print('Running {} of {} trials (filtered)'.format(
+                       len(tparams_list), total))
+        
+        # Map from tid to (prog, digest) of first output seen,
+        # and list of (tid, goalprog, prog) disagreements.
+        self.goal_digests = {}
+        self.mismatches = []
+        
         datapoint_list = self.run_all_tests(tparams_list)
+        self.notify(None)
+        
+        if self.workflow.fused_verify:
+            if len(self.mismatches) == 0:
+                self.print('Output agrees on all datasets.')
+            else:
+                self.print('Output disagrees on {} trial(s).'.format(
+                           len(self.mismatches)))
         
         out_fn = self.workflow.data_filename
+        if self.workflow.filtering and os.path.exists(out_fn):
+            with open(out_fn, 'rb') as in_file:
+                old_datapoints = pickle.load(in_file)
+            datapoint_list = self.merge_data(old_datapoints, tparams_list,
+                                             datapoint_list)
+            self.print('Merging into existing data')
         self.print('Writing to ' + out_fn)
         with open(out_fn, 'wb') as out_file:
             pickle.dump(datapoint_list, out_file)
         
         self.print('Done.')
     
+    @property
+    def inputs(self):
+        return ([self.workflow.params_filename] +
+                sorted(glob.glob(self.workflow.ds_filename_glob)))
+    
+    @property
+    def outputs(self):
+        return [self.workflow.data_filename]
+    
     def cleanup(self):
         self.remove_file(self.workflow.data_filename)
         self.remove_file(self.workflow.pipe_filename)
+        for fn in glob.glob(self.workflow.profiles_dirname + '*'):
+            self.remove_file(fn)
+        self.remove_file(self.workflow.profiles_dirname)
@@ -0,0 +1,246 @@
+"""Running many experiment workflows at once."""
+
+
+__all__ = [
+    'CoreScheduler',
+    'Suite',
+]
+
+
+import os
+import io
+import sys
+import queue
+import threading
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from frexp.util import thread_safe_context
+from frexp.live import LivePlotter
+
+
+def available_cores():
+    """Return the sorted list of cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class PinnedTarget:
+    
+    """Process target that restricts itself to one core, then calls
+    the wrapped target. Pickleable if the wrapped target is.
+    """
+    
+    def __init__(self, target, core):
+        self.target = target
+        self.core = core
+    
+    def __call__(self, *args):
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {self.core})
+        self.target(*args)
+
+
+class CoreScheduler:
+    
+    """Shared scheduler for benchmark trials of concurrently running
+    workflows. Each trial gets a core to itself, and its driver process
+    is pinned to that core, so trials never compete for a CPU. Trials
+    wait when all cores are taken.
+    """
+    
+    def __init__(self, cores=None):
+        if cores is None:
+            cores = available_cores()
+            # Leave a core for the parent and the rest of the system.
+            if len(cores) > 1:
+                cores = cores[1:]
+        assert len(cores) > 0
+        self.cores = list(cores)
+        self.context = thread_safe_context()
+        self.free = queue.Queue()
+        for core in self.cores:
+            self.free.put(core)
+    
+    @contextmanager
+    def core(self):
+        """Context manager that reserves a free core, blocking until
+        one is available, and returns it.
+        """
+        core = self.free.get()
+        try:
+            yield core
+        finally:
+            self.free.put(core)
+    
+    def run_process(self, target, args):
+        """Run target(*args) in a child process pinned to a free core.
+        Return the child's exit code. May be called from any thread
+        (see util.thread_safe_context()).
+        """
+        with self.core() as core:
+            child = self.context.Process(
+                target=PinnedTarget(target, core), args=args)
+            child.start()
+            child.join()
+        return child.exitcode
+
+
+def _init_worker():
+    # Figures are only saved, never shown, by worker processes.
+    try:
+        from frexp.plot.drawfig import _init_render_worker
+    except ImportError:
+        return
+    _init_render_worker()
+
+
+def run_phase(cls, prefix, phase, configure=None):
+    """Run the named phase of a freshly constructed workflow, in a
+    worker process, first passing the workflow to configure if given.
+    Return its status output.
+    """
+    out = io.StringIO()
+    workflow = cls(prefix, fout=out)
+    if configure is not None:
+        configure(workflow)
+    if phase == 'view':
+        workflow.viewer.headless = True
+    try:
+        getattr(workflow, phase)()
+    finally:
+        workflow.close_event_sinks()
+    return out.getvalue()
+
+
+class Suite:
+    
+    """Run the generate, benchmark, extract, and view phases of several
+    ExpWorkflows concurrently.
+    
+    The generate, extract, and view phases run in a pool of worker
+    processes. Since these are not timed, they may share the CPUs
+    freely. Workers construct their own workflow instance as
+    type(workflow)(workflow.prefix, fout=...), so workflow classes must
+    be importable and constructible that way. Settings made on the
+    given instances are not carried over; instead, if configure is
+    given, it is called with each constructed instance to make them.
+    It must be pickleable. Event sinks are closed when the phase
+    finishes (see Workflow.close_event_sinks()). Plots are saved but
+    not shown.
+    
+    Benchmarks run in the main process, one thread per workflow, with
+    all trials going through a single CoreScheduler. Each runner runs
+    its trials concurrently (see Runner.scheduler), so that all cores
+    are kept busy however few workflows there are. Phases do not
+    overlap, so that benchmarks are not disturbed by other work.
+    
+    Status output of each workflow is buffered and printed as a block
+    when its phase finishes. A workflow whose phase fails is reported
+    and dropped from later phases.
+    """
+    
+    phases = ['generate', 'benchmark', 'extract', 'view']
+    
+    def __init__(self, workflows, *, workers=None, cores=None,
+                 configure=None, fout=sys.stdout):
+        self.workflows = list(workflows)
+        self.workers = workers
+        """Number of worker processes, defaulting to the CPU count."""
+        self.configure = configure
+        self.scheduler = CoreScheduler(cores)
+        self.fout = fout
+        self.failed = {}
+        """Map from prefix of each failed workflow to the traceback of
+        its failure.
+        """
+    
+    def print(self, *args, **kargs):
+        print(*args, file=self.fout, flush=True, **kargs)
+    
+    def report(self, workflow, phase, output):
+        self.print('==== {} ({}): {}'.format(type(workflow).__name__,
+                                            workflow.prefix, phase))
+        self.print(output, end='')
+    
+    def fail(self, workflow, phase, tb):
+        self.report(workflow, phase, tb)
+        self.failed[workflow.prefix] = tb
+    
+    @property
+    def active(self):
+        return [wf for wf in self.workflows
+                if wf.prefix not in self.failed]
+    
+    def run_pooled(self, phase):
+        workflows = self.active
+        with ProcessPoolExecutor(self.workers,
+                                 initializer=_init_worker) as executor:
+            futures = [executor.submit(run_phase, type(wf), wf.prefix,
+                                       phase, self.configure)
+                       for wf in workflows]
+            for wf, fut in zip(workflows, futures):
+                try:
+                    self.report(wf, phase, fut.result())
+                except Exception:
+                    self.fail(wf, phase, traceback.format_exc())
+    
+    def benchmark_one(self, workflow):
+        # Buffer the runner's progress output, since it would
+        # otherwise interleave with that of other workflows. Live
+        # plots are detached, since this runs outside the main thread,
+        # where GUI backends can't draw.
+        old_fout = workflow.fout
+        workflow.fout = out = io.StringIO()
+        runner = workflow.runner
+        old_listeners = runner.listeners
+        runner.listeners = [l for l in old_listeners
+                            if not isinstance(l, LivePlotter)]
+        runner.scheduler = self.scheduler
+        try:
+            workflow.benchmark()
+        except Exception:
+            return False, out.getvalue() + traceback.format_exc()
+        finally:
+            workflow.fout = old_fout
+            runner.listeners = old_listeners
+            runner.scheduler = None
+        return True, out.getvalue()
+    
+    def run_benchmarks(self):
+        workflows = self.active
+        results = [None] * len(workflows)
+        
+        def job(i):
+            results[i] = self.benchmark_one(workflows[i])
+        
+        threads = [threading.Thread(target=job, args=(i,))
+                   for i in range(len(workflows))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        for wf, (ok, output) in zip(workflows, results):
+            if ok:
+                self.report(wf, 'benchmark', output)
+            else:
+                self.fail(wf, 'benchmark', output)
+    
+    def run(self, phases=None):
+        """Run the given phases (default all), in order, on all
+        workflows that have not failed.
+        """
+        if phases is None:
+            phases = self.phases
+        for phase in phases:
+            assert phase in self.phases
+            if phase == 'benchmark':
+                self.run_benchmarks()
+            else:
+                self.run_pooled(phase)
+        if len(self.failed) > 0:
+            self.print('{} of {} workflows failed.'.format(
+                       len(self.failed), len(self.workflows)))
@@ -0,0 +1,47 @@
+"""Unit tests for cli.py."""
+
+
+import unittest
+
+from frexp.workflow import Workflow
+from frexp.cli import *
+from frexp.cli import make_parser
+
+
+class CliCase(unittest.TestCase):
+    
+    def test_load_workflow_class(self):
+        self.assertIs(load_workflow_class('frexp.workflow.Workflow'),
+                      Workflow)
+        self.assertIs(load_workflow_class('frexp.workflow:Workflow'),
+                      Workflow)
+        with self.assertRaises(ValueError):
+            load_workflow_class('Workflow')
+    
+    def test_parse(self):
+        args = make_parser().parse_args(
+            ['a.B', '-p', 'benchmark', 'view', '--prog', 'x', 'y',
+             '--xmin', '10', '--xmax', '2.5', '--profile'])
+        self.assertEqual(args.workflows, ['a.B'])
+        self.assertEqual(args.phases, ['benchmark', 'view'])
+        self.assertEqual(args.progs, ['x', 'y'])
+        self.assertEqual((args.xmin, args.xmax), (10, 2.5))
+        self.assertTrue(args.profile)
+        self.assertEqual(args.profile_lines, 25)
+        
+        args = make_parser().parse_args(['a.B'])
+        self.assertEqual(args.phases,
+                         ['generate', 'benchmark', 'extract', 'view'])
+        self.assertFalse(args.profile)
+        
+        # Flags before the workflow don't consume it.
+        args = make_parser().parse_args(
+            ['--profile', '--profile-lines', '0', 'a.B', '-p', 'extract'])
+        self.assertEqual(args.workflows, ['a.B'])
+        self.assertEqual(args.phases, ['extract'])
+        self.assertTrue(args.profile)
+        self.assertEqual(args.profile_lines, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Unit tests for compare.py."""
+
+
+import unittest
+import math
+from io import StringIO
+
+import numpy as np
+
+from frexp.compare import *
+
+
+def make_points(prog, x, ys):
+    return [{'dsparams': {'x': x}, 'prog': prog,
+             'results': {'stdmetric': y}}
+            for y in ys]
+
+
+class CompareCase(unittest.TestCase):
+    
+    def test_mann_whitney_u(self):
+        u, p, effect = mann_whitney_u([[1, 2, 3], [1, 2]],
+                                      [[4, 5, 6], [1, 2, 3, 4]])
+        self.assertEqual(list(u), [0, 2])
+        self.assertAlmostEqual(p[0], 0.0495, places=3)
+        self.assertEqual(effect[0], -1)
+        
+        # Same as counting all pairs, with ties and empty cells.
+        rng = np.random.default_rng(0)
+        xs_cells = [rng.integers(0, 5, n).tolist() for n in [7, 0, 3, 12]]
+        ys_cells = [rng.integers(0, 5, n).tolist() for n in [5, 4, 0, 9]]
+        u, _p, _effect = mann_whitney_u(xs_cells, ys_cells)
+        self.assertEqual(list(u), [sum((x > y) + 0.5 * (x == y)
+                                       for x in xs for y in ys)
+                                   for xs, ys in zip(xs_cells, ys_cells)])
+        
+        # Large cells take linear, not quadratic, space.
+        u, _p, _effect = mann_whitney_u([np.arange(100000.)],
+                                        [np.arange(100000.) + 0.5])
+        self.assertEqual(u[0], 100000 * 99999 / 2)
+    
+    def test_bootstrap_ratio_ci(self):
+        ratio, lo, hi = bootstrap_ratio_ci([[2, 2, 2], [1, 2, 3]],
+                                           [[1, 1], [2, 2, 2]],
+                                           200, 0.95, 0)
+        self.assertEqual(list(ratio), [2, 1])
+        self.assertEqual((lo[0], hi[0]), (2, 2))
+        self.assertTrue(lo[1] < 1 < hi[1])
+    
+    def test_compare(self):
+        wf = CompareWorkflow('base', 'cand', prefix='cmp', fout=StringIO())
+        baseline = (make_points('a', 1, [1.0, 1.1, 0.9, 1.0, 1.05] * 2) +
+                    make_points('b', 1, [1.0, 1.1, 0.9, 1.0, 1.05] * 2))
+        candidate = (make_points('a', 1, [2.0, 2.1, 1.9, 2.0, 2.05] * 2) +
+                     make_points('b', 1, [1.0, 1.1, 0.9, 1.0, 1.05] * 2))
+        results = wf.comparator.compare(baseline, candidate)
+        self.assertEqual([r['change'] for r in results],
+                         ['regression', None])
+        self.assertAlmostEqual(results[0]['ratio'], 2, places=1)
+        
+        plotdata = wf.comparator.get_plotdata(results)
+        series = plotdata['axes'][0]['series']
+        self.assertEqual([s['name'] for s in series], ['a', 'b'])
+        self.assertEqual(series[0]['data'][0][:2], (1, results[0]['ratio']))
+        self.assertIn('fit', series[0])
+        
+        # The ratio's confidence interval is only bootstrapped on
+        # request.
+        self.assertTrue(math.isnan(results[0]['ratio_lo']))
+        self.assertEqual(series[0]['data'][0][2:], (0, 0))
+        wf.comparator.ratio_ci = True
+        results = wf.comparator.compare(baseline, candidate)
+        self.assertTrue(results[0]['ratio_lo'] < 2 < results[0]['ratio_hi'])
+    
+    def test_report_zero_ratio(self):
+        wf = CompareWorkflow('base', 'cand', prefix='cmp', fout=StringIO())
+        # E.g. a count of collections dropping to zero.
+        baseline = (make_points('a', 1, [3, 4, 3, 4, 3] * 2) +
+                    make_points('b', 1, [3, 4, 3, 4, 3] * 2))
+        candidate = (make_points('a', 1, [0] * 10) +
+                     make_points('b', 1, [6, 8, 6, 8, 6] * 2))
+        results = wf.comparator.compare(baseline, candidate)
+        self.assertEqual(results[0]['ratio'], 0)
+        wf.comparator.report(results)
+        lines = wf.fout.getvalue().splitlines()
+        self.assertIn('a @ 1', lines[1])
+        self.assertIn('b @ 1', lines[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Unit tests for decimate.py."""
+
+
+import math
+import unittest
+
+from frexp.decimate import *
+
+
+class DecimateCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.points = [(x, math.sin(x / 100), 0, 0) for x in range(10000)]
+        # An outlier.
+        self.points[5000] = (5000, 50.0, 0, 0)
+    
+    def test_lttb(self):
+        result = lttb(self.points, 100)
+        self.assertEqual(len(result), 100)
+        self.assertEqual(result[0], self.points[0])
+        self.assertEqual(result[-1], self.points[-1])
+        self.assertIn(self.points[5000], result)
+        xs = [p[0] for p in result]
+        self.assertEqual(xs, sorted(xs))
+    
+    def test_minmax_bins(self):
+        result = minmax_bins(list(reversed(self.points)), 100)
+        self.assertLessEqual(len(result), 102)
+        self.assertIn(self.points[5000], result)
+        ys = [p[1] for p in result]
+        self.assertEqual(max(ys), 50.0)
+        self.assertAlmostEqual(min(ys), -1, places=3)
+        xs = [p[0] for p in result]
+        self.assertEqual(xs, sorted(xs))
+    
+    def test_decimate(self):
+        small = self.points[:10]
+        self.assertIs(decimate(small, 'lttb', 100), small)
+        self.assertEqual(len(decimate(self.points, 'lttb', 50)), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Unit tests for driver.py."""
+
+
+import unittest
+import os
+import gc
+import time
+import pickle
+import tempfile
+from unittest import mock
+
+from frexp.util import deep_getsizeof
+from frexp.driver import *
+from frexp.verifier import canonical_digest
+
+
+class SumDriver(Driver):
+    
+    target_time = 0.01
+    
+    def setup(self):
+        self.items = list(range(self.dataset['n']))
+        self.calls = 0
+        self.gc_states = set()
+    
+    def operation(self):
+        self.calls += 1
+        self.gc_states.add(gc.isenabled())
+        return sum(self.items)
+    
+    def teardown(self):
+        self.results['calls'] = self.calls
+        self.results['gc_states'] = self.gc_states
+
+
+class DriverCase(unittest.TestCase):
+    
+    def run_driver(self, driver, dataset, tparams):
+        with tempfile.TemporaryDirectory() as d:
+            pipe_fn = os.path.join(d, 'pipe.pickle')
+            with open(pipe_fn, 'wb') as pf:
+                pickle.dump((dataset, 'prog', tparams), pf)
+            driver(pipe_fn)
+            with open(pipe_fn, 'rb') as pf:
+                return pickle.load(pf)
+    
+    def test_calibrate(self):
+        results = self.run_driver(SumDriver, {'n': 10}, {})
+        loops = results['loops']
+        # Loop counts follow the 1, 2, 5 sequence.
+        self.assertIn(str(loops).strip('0'), ['1', '2', '5'])
+        self.assertGreater(loops, 1)
+        self.assertGreater(results['calls'], loops)
+        self.assertGreaterEqual(results['stdmetric'] * loops,
+                                SumDriver.target_time)
+        self.assertEqual(results['stdmetric'], results['process_time'])
+        self.assertIn('wall_time', results)
+        self.assertNotIn('output', results)
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(results['gc_states'], {False})
+    
+    def test_fixed_loops_and_output(self):
+        class D(SumDriver):
+            loops = 7
+            gc_policy = 'leave'
+        results = self.run_driver(D, {'n': 10}, {'verify_output': True})
+        self.assertEqual(results['loops'], 7)
+        # The timed loop, plus one untimed call for the output.
+        self.assertEqual(results['calls'], 8)
+        self.assertEqual(results['output'], 45)
+        self.assertEqual(results['gc_states'], {True})
+        
+        # Digested in the driver, before the results are pickled.
+        results = self.run_driver(D, {'n': 10}, {'verify_output': True,
+                                                 'digest_output': True})
+        self.assertNotIn('output', results)
+        self.assertEqual(results['output_digest'], canonical_digest(45))
+    
+    def test_calibration_limit(self):
+        class D(SumDriver):
+            max_calibration_time = 0.05
+            def operation(self):
+                # Takes wall time but almost no process time.
+                time.sleep(0.01)
+        with self.assertRaises(ValueError):
+            self.run_driver(D, {'n': 10}, {})
+    
+    def test_memory(self):
+        class D(SumDriver):
+            loops = 1
+            memory = 'tracemalloc'
+            def operation(self):
+                super().operation()
+                return [0] * 10000
+        results = self.run_driver(D, {'n': 10}, {})
+        self.assertGreater(results['alloc_peak'], 10000 * 8)
+        self.assertGreater(results['maxrss'], 0)
+        
+        D.memory = 'rss'
+        results = self.run_driver(D, {'n': 10}, {})
+        self.assertGreaterEqual(results['rss_delta'], 0)
+        self.assertGreaterEqual(results['rss_peak'], results['rss_delta'])
+    
+    def test_no_maxrss(self):
+        class D(SumDriver):
+            loops = 1
+        def unavailable():
+            raise NotImplementedError
+        # As on platforms without the resource module.
+        with mock.patch('frexp.driver.get_peak_mem_usage', unavailable):
+            results = self.run_driver(D, {'n': 10}, {})
+        self.assertNotIn('maxrss', results)
+        self.assertEqual(results['loops'], 1)
+    
+    def test_gc(self):
+        class D(SumDriver):
+            loops = 200
+            def operation(self):
+                super().operation()
+                # Reference cycles for the collector to find.
+                for _ in range(100):
+                    l = []
+                    l.append(l)
+        results = self.run_driver(D, {'n': 10}, {'gc_policy': 'collect'})
+        self.assertEqual(results['gc_policy'], 'collect')
+        self.assertEqual(results['gc_states'], {True})
+        self.assertGreater(sum(results['gc_collections']), 0)
+        self.assertGreater(results['gc_collected'], 0)
+        self.assertGreater(results['gc_time'], 0)
+        
+        results = self.run_driver(D, {'n': 10}, {})
+        self.assertEqual(results['gc_policy'], 'disable')
+        self.assertEqual(results['gc_collections'], [0, 0, 0])
+        
+        with self.assertRaises(ValueError):
+            self.run_driver(D, {'n': 10}, {'gc_policy': 'bogus'})
+    
+    def test_size(self):
+        class D(SumDriver):
+            loops = 1
+            def get_size_object(self):
+                return self.items
+        results = self.run_driver(D, {'n': 10}, {})
+        self.assertEqual(results['size'], deep_getsizeof(list(range(10))))
+
+
+if __name__ == '__main__':
+    unittest.main()
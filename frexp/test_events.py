@@ -0,0 +1,63 @@
+"""Unit tests for events.py."""
+
+
+import unittest
+import os
+import json
+import tempfile
+from io import StringIO
+
+from frexp.workflow import Workflow
+from frexp.events import *
+
+
+class EventsCase(unittest.TestCase):
+    
+    def test_emit(self):
+        wf = Workflow('p', fout=StringIO())
+        events = []
+        wf.event_sinks.append(events.append)
+        wf.emit('trial_start', index=1)
+        self.assertEqual(len(events), 1)
+        ev = events[0]
+        self.assertEqual((ev['event'], ev['prefix'], ev['index']),
+                         ('trial_start', 'p', 1))
+    
+    def test_jsonlines_sink(self):
+        with tempfile.TemporaryDirectory() as d:
+            fn = os.path.join(d, 'events.jsonl')
+            sink = JSONLinesSink(fn, flush_interval=3600)
+            sink({'event': 'trial_end', 'x': {1}})
+            # Buffered until the end of the task.
+            self.assertFalse(os.path.exists(fn))
+            sink({'event': 'benchmark_end'})
+            sink({'event': 'trial_start'})
+            with open(fn) as f:
+                lines = [json.loads(line) for line in f]
+            self.assertEqual([e['event'] for e in lines],
+                             ['trial_end', 'benchmark_end'])
+            self.assertEqual(lines[0]['x'], '{1}')
+            
+            sink.close()
+            with open(fn) as f:
+                self.assertEqual(len(f.readlines()), 3)
+    
+    def test_console_renderer(self):
+        out = StringIO()
+        r = ConsoleRenderer(out, refresh_interval=3600)
+        for i in range(1, 4):
+            r({'event': 'trial_end', 'prefix': 'p', 'index': i,
+               'total': 3, 'throughput': 2.0, 'eta': (3 - i) / 2.0})
+        r({'event': 'convergence', 'status': 'max_repeats'})
+        r({'event': 'benchmark_end', 'prefix': 'p', 'trials': 3,
+           'elapsed': 1.5})
+        # First and last trials, then the summary.
+        self.assertEqual(out.getvalue().splitlines(), [
+            '[p] trial 1/3  2.00 trials/s  ETA 0:00:01',
+            '[p] trial 3/3  2.00 trials/s  ETA 0:00:00',
+            '[p] 3 trials in 0:00:02, 1 did not converge',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
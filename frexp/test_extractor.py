@@ -0,0 +1,205 @@
+"""Unit tests for extractor.py."""
+
+
+import unittest
+from io import StringIO
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+from frexp.workflow import Workflow
+from frexp.extractor import *
+from frexp.util import fingerprint
+
+
+def make_points(entries):
+    """Make datapoints from (prog, x, y) triples."""
+    return [{'dsparams': {'x': x}, 'prog': prog, 'tid': str(x),
+             'results': {'time': y}}
+            for prog, x, y in entries]
+
+
+class ExtractorCase(unittest.TestCase):
+    
+    def test_series_index(self):
+        class E(MetricExtractor):
+            metric = 'time'
+        e = E(Workflow(fout=StringIO()))
+        
+        data = make_points([('a', 1, 1.0), ('b', 1, 2.0),
+                            ('a', 2, 3.0), ('b', 2, 4.0)])
+        self.assertEqual(e.get_series_data(data, 'a'),
+                         [data[0], data[2]])
+        self.assertEqual(e.get_series_data(data, 'c'), [])
+        
+        # Index is reused for the same data and rebuilt for new data.
+        index = e.get_index(data, 'prog')
+        self.assertIs(e.get_index(data, 'prog'), index)
+        data2 = list(data)
+        self.assertIsNot(e.get_index(data2, 'prog'), index)
+        
+        # Nested keys.
+        index = e.get_index(data, ('dsparams', 'x'))
+        self.assertEqual(index[2], [data[2], data[3]])
+    
+    
+    def test_normalize(self):
+        class E(NormalizedExtractor):
+            base_sid = 'a'
+            def project_y(self, p):
+                return p['results']['time']
+            def normalize(self, pre_y, base_y):
+                return pre_y / base_y
+        
+        data = make_points([('a', 1, 2.0), ('a', 1, 4.0), ('a', 2, 5.0),
+                            ('b', 1, 6.0), ('b', 2, 10.0), ('b', 3, 1.0)])
+        
+        # Missing base points are skipped.
+        fout = StringIO()
+        e = E(Workflow(fout=fout))
+        points = e.get_series_points(data, 'b', average=True)
+        self.assertEqual(points, [(1, 2.0, 0, 0), (2, 2.0, 0, 0)])
+        self.assertIn('Warning', fout.getvalue())
+        self.assertEqual(e.get_series_points(data, 'a', average=True), [])
+        
+        # Vectorized normalization gives the same result.
+        e.vectorized = True
+        self.assertEqual(e.get_series_points(data, 'b', average=True),
+                         points)
+        
+        e.missing_policy = 'error'
+        with self.assertRaises(ValueError):
+            e.get_series_points(data, 'b', average=True)
+    
+    
+    def test_bootstrap(self):
+        class E(MetricExtractor):
+            metric = 'time'
+            error_mode = 'bootstrap'
+        e = E(Workflow(fout=StringIO()))
+        
+        xy = [(1, y) for y in [1.0, 2.0, 3.0, 4.0, 10.0]] + [(2, 5.0)]
+        points = e.average_points(xy, 0)
+        (x1, y1, lo1, hi1), (x2, y2, lo2, hi2) = points
+        self.assertEqual((x1, y1), (1, 4.0))
+        self.assertTrue(0 < lo1 < 3 and 0 < hi1 < 6)
+        self.assertEqual((x2, y2, lo2, hi2), (2, 5.0, 0, 0))
+        
+        # Deterministic, and the same when computed in a pool.
+        self.assertEqual(e.average_points(xy, 0), points)
+        e.bootstrap_workers = 2
+        try:
+            self.assertEqual(e.average_points(xy, 0), points)
+        finally:
+            e.close_pool()
+    
+    
+    def test_series_cache(self):
+        class W(Workflow):
+            def __init__(self, prefix):
+                super().__init__(prefix, fout=StringIO())
+                self.data_filename = prefix + '_data.pickle'
+                self.plotdata_filename = prefix + '_plotdata.pickle'
+                self.plotcache_filename = prefix + '_plotcache.pickle'
+        
+        class E(MetricExtractor):
+            metric = 'time'
+            series = [('a', 'A', 'red', '- o normal')]
+            cache_series = True
+            generate_csv = False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            wf = W(os.path.join(tmp, 'exp'))
+            with open(wf.data_filename, 'wb') as f:
+                pickle.dump(make_points([('a', 1, 1.0), ('a', 1, 3.0)]), f)
+            
+            e = E(wf)
+            e.run()
+            self.assertIn('Reused 0 of 1', wf.fout.getvalue())
+            
+            # Presentation changes reuse the cache without loading data.
+            E.series = [('a', 'Renamed', 'blue', '- o normal')]
+            e = E(wf)
+            e.run()
+            self.assertIn('Reused 1 of 1', wf.fout.getvalue())
+            self.assertIsNone(e.data)
+            with open(wf.plotdata_filename, 'rb') as f:
+                plotdata = pickle.load(f)
+            series = plotdata['axes'][0]['series'][0]
+            self.assertEqual(series['name'], 'Renamed')
+            self.assertEqual(series['data'], [(1, 2.0, 1.0, 1.0)])
+            
+            # Aggregation changes recompute.
+            E.discard_ratio = 0.25
+            e = E(wf)
+            e.run()
+            self.assertIsNotNone(e.data)
+        
+        # So do changes to the base-value and bootstrap code.
+        key = e.get_series_cache_key('a', True)
+        class E2(E):
+            def get_base_values(self, datapoints, base_sid):
+                return super().get_base_values(datapoints, base_sid)
+        e2 = E2(wf)
+        e2._data_digest = e._data_digest
+        self.assertNotEqual(e2.get_series_cache_key('a', True), key)
+        e.cache_helpers = ['get_keyfunc']
+        self.assertNotEqual(e.get_series_cache_key('a', True), key)
+    
+    def test_fingerprint_stable(self):
+        # Extractor settings must not fingerprint differently in each
+        # process, or neither the series cache nor skip_fresh would hit.
+        code = ('from frexp.extractor import *; '
+                'from frexp.util import fingerprint; '
+                'print(fingerprint(Extractor, SimpleExtractor, '
+                'NormalizedExtractor))')
+        digests = [subprocess.check_output([sys.executable, '-c', code],
+                                           universal_newlines=True)
+                   for _ in range(2)]
+        self.assertEqual(digests[0], digests[1])
+        self.assertEqual(digests[0].strip(),
+                         fingerprint(Extractor, SimpleExtractor,
+                                     NormalizedExtractor))
+    
+    
+    def test_decimation(self):
+        class E(MetricExtractor):
+            metric = 'time'
+            series = [('a', 'A', 'red', '- o normal')]
+            decimation = ('lttb', 5)
+        e = E(Workflow(fout=StringIO()))
+        e.data = make_points([('a', x, float(x % 7)) for x in range(20)])
+        
+        # Downsampling is left to drawing; the data stays complete.
+        ax = e.get_plotdata()['axes'][0]
+        self.assertEqual(ax['series'][0]['decimation'], ('lttb', 5))
+        self.assertEqual(len(ax['series'][0]['data']), 20)
+        header, csvdata = e.get_csvdata(ax)
+        self.assertEqual(len(csvdata), 20)
+    
+    def test_multi_metric(self):
+        class E(MultiMetricExtractor):
+            metrics = [('time', 'Time', 's'), ('mem', 'Memory', 'B')]
+            series = [('a', 'A', 'red', '- o normal')]
+        e = E(Workflow(fout=StringIO()))
+        e.data = [{'dsparams': {'x': 1}, 'prog': 'a',
+                   'results': {'time': t, 'mem': m}}
+                  for t, m in [(1.0, 10), (3.0, 30)]]
+        
+        plotdata = e.get_plotdata()
+        axes = plotdata['axes']
+        self.assertEqual([ax['axes_title'] for ax in axes],
+                         ['Time', 'Memory'])
+        self.assertEqual(axes[0]['series'][0]['data'], [(1, 2.0, 1.0, 1.0)])
+        self.assertEqual(axes[1]['series'][0]['data'], [(1, 20.0, 10.0, 10.0)])
+        
+        header, csvdata = e.get_wide_csvdata(axes)
+        self.assertEqual(header, ['x', 'Time: A', 'Memory: A'])
+        self.assertEqual(csvdata, [{'x': 1, 'Time: A': 2.0,
+                                    'Memory: A': 20.0}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Unit tests for fitting.py."""
+
+
+import math
+import unittest
+
+from frexp.fitting import *
+
+
+class FittingCase(unittest.TestCase):
+    
+    def test_fit_series(self):
+        xs = [10, 20, 40, 80, 160, 320]
+        
+        points = [(x, 3 * x * x + 5, 0, 0) for x in xs]
+        fit = fit_series(points, ['n', 'nlogn', 'n2'])
+        self.assertEqual(fit['model'], 'n2')
+        self.assertAlmostEqual(fit['params']['a'], 3)
+        self.assertAlmostEqual(fit['r2'], 1)
+        self.assertEqual(len(fit['residuals']), len(xs))
+        
+        points = [(x, 2 * x * math.log(x), 0, 0) for x in xs]
+        fit = fit_series(points, ['n', 'nlogn', 'n2'])
+        self.assertEqual(fit['model'], 'nlogn')
+        
+        points = [(x, 0.5 * x ** 1.5, 0, 0) for x in xs]
+        fit = fit_series(points)
+        self.assertEqual(fit['model'], 'power')
+        self.assertAlmostEqual(fit['params']['k'], 1.5)
+        
+        # Constant data is not explained by a degenerate a * f(x) + b.
+        points = [(x, 7.0, 0, 0) for x in xs]
+        fit = fit_series(points)
+        self.assertEqual(fit['model'], 'const')
+        self.assertEqual(fit['params'], {'b': 7.0})
+        
+        # Noise on a fixed-shape curve does not make the free exponent
+        # win, even though it has lower residual sum of squares and BIC.
+        noise = [1.03, 0.97, 0.96, 1.01, 0.98, 0.96]
+        points = [(x, 4 * x * e, 0, 0) for x, e in zip(xs, noise)]
+        fit = fit_series(points, ['n', 'power'])
+        self.assertLess(fit['fits']['power']['rss'], fit['rss'])
+        self.assertLess(fit['fits']['power']['bic'], fit['bic'])
+        self.assertEqual(fit['model'], 'n')
+        
+        # Too few points.
+        self.assertIsNone(fit_series([(1, 1, 0, 0), (2, 2, 0, 0)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
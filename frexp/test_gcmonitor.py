@@ -0,0 +1,30 @@
+"""Unit tests for gcmonitor.py."""
+
+
+import unittest
+import gc
+
+from frexp.gcmonitor import *
+
+
+class GCMonitorCase(unittest.TestCase):
+    
+    def test_monitor(self):
+        with GCMonitor() as m:
+            l = []
+            l.append(l)
+            del l
+            gc.collect()
+        self.assertNotIn(m.callback, gc.callbacks)
+        self.assertEqual(m.collections[2], 1)
+        self.assertGreaterEqual(m.collected, 1)
+        self.assertGreater(m.pause, 0)
+        
+        with GCMonitor() as m:
+            pass
+        self.assertEqual(sum(m.collections), 0)
+        self.assertEqual(m.pause_ns, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Unit tests for live.py."""
+
+
+import unittest
+from io import StringIO
+
+import numpy as np
+
+from frexp.workflow import Workflow
+from frexp.extractor import MetricExtractor
+from frexp.live import *
+
+
+class LiveCase(unittest.TestCase):
+    
+    def test_online_stats(self):
+        ys = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+        s = OnlineStats()
+        for y in ys:
+            s.add(y)
+        self.assertEqual(s.n, len(ys))
+        self.assertAlmostEqual(s.mean, np.mean(ys))
+        self.assertAlmostEqual(s.std, np.std(ys))
+    
+    def test_aggregator(self):
+        class E(MetricExtractor):
+            metric = 'time'
+            series = [('a', 'A', 'red', '- o normal'),
+                      ('b', 'B', 'blue', '- o normal')]
+        agg = LiveAggregator(E(Workflow(fout=StringIO())))
+        for x, y in [(1, 1.0), (1, 3.0), (2, 5.0)]:
+            agg.add({'dsparams': {'x': x}, 'prog': 'a',
+                     'results': {'time': y}})
+        
+        series = agg.get_plotdata()['axes'][0]['series']
+        self.assertEqual(series[0]['data'],
+                         [(1, 2.0, 1.0, 1.0), (2, 5.0, 0.0, 0.0)])
+        self.assertEqual(series[1]['data'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
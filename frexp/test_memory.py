@@ -0,0 +1,44 @@
+"""Unit tests for memory.py."""
+
+
+import unittest
+import time
+
+from frexp.util import get_mem_usage, get_peak_mem_usage
+from frexp.memory import *
+
+
+class MemoryCase(unittest.TestCase):
+    
+    def test_mem_usage(self):
+        self.assertGreater(get_mem_usage(), 0)
+        self.assertGreater(get_peak_mem_usage(), 0)
+    
+    def test_rss_sampler(self):
+        with RSSSampler() as sampler:
+            # Touch every page so that it is resident.
+            block = bytearray(64 * 2 ** 20)
+            for i in range(0, len(block), 4096):
+                block[i] = 1
+            # Keep it until a sample has been taken since.
+            start = sampler.samples
+            while sampler.samples < start + 2:
+                time.sleep(sampler.interval)
+            del block
+        self.assertGreaterEqual(sampler.samples, 2)
+        self.assertGreater(sampler.delta, 32 * 2 ** 20)
+    
+    def test_allocation_tracer(self):
+        with AllocationTracer() as tracer:
+            block = bytes(2 ** 20)
+            del block
+            kept = bytes(2 ** 16)
+        self.assertGreaterEqual(tracer.peak, 2 ** 20)
+        self.assertLess(tracer.peak, 2 ** 21)
+        self.assertGreaterEqual(tracer.net, 2 ** 16)
+        self.assertLess(tracer.net, 2 ** 17)
+        del kept
+
+
+if __name__ == '__main__':
+    unittest.main()
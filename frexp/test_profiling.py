@@ -0,0 +1,45 @@
+"""Unit tests for profiling.py."""
+
+
+import unittest
+import cProfile
+import pstats
+
+from frexp.profiling import *
+
+
+def inner(n):
+    return sum(i * i for i in range(n))
+
+def outer():
+    return [inner(20000) for _ in range(5)]
+
+
+class ProfilingCase(unittest.TestCase):
+    
+    def setUp(self):
+        profiler = cProfile.Profile()
+        profiler.runcall(outer)
+        self.stats = pstats.Stats(profiler)
+    
+    def test_top_functions(self):
+        top = top_functions(self.stats, 3)
+        self.assertEqual(len(top), 3)
+        self.assertIn('(outer)', top[0]['function'])
+        self.assertGreaterEqual(top[0]['cumtime'], top[1]['cumtime'])
+        
+        top = top_functions(self.stats, 100, sort='tottime')
+        inner_row = [r for r in top if r['function'].endswith('(inner)')]
+        self.assertEqual(inner_row[0]['ncalls'], 5)
+    
+    def test_collapsed_stacks(self):
+        lines = collapsed_stacks(self.stats)
+        edges = {line.rsplit(' ', 1)[0] for line in lines}
+        self.assertIn('test_profiling.py:11(inner);'
+                      '<built-in method builtins.sum>', edges)
+        for line in lines:
+            self.assertGreater(int(line.rsplit(' ', 1)[1]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Unit tests for report.py."""
+
+
+import unittest
+import os
+import io
+import pickle
+import tempfile
+
+from frexp.workflow import Workflow
+from frexp.extractor import MetricExtractor
+from frexp.report import *
+
+
+def write_plotdata(filename, scale):
+    class E(MetricExtractor):
+        metric = 'time'
+        series = [('a', 'A', 'red', '- o normal')]
+    e = E(Workflow(fout=io.StringIO()))
+    e.data = [{'dsparams': {'x': x}, 'prog': 'a',
+               'results': {'time': x * scale}}
+              for x in range(1, 4)]
+    with open(filename, 'wb') as f:
+        pickle.dump(e.get_plotdata(), f)
+
+
+class ReportCase(unittest.TestCase):
+    
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as d:
+            fns = [os.path.join(d, 'exp{}_plotdata.pickle'.format(i))
+                   for i in range(2)]
+            for i, fn in enumerate(fns, 1):
+                write_plotdata(fn, i)
+            out_fn = os.path.join(d, 'report.html')
+            
+            def build():
+                report = Report(out_fn, workers=2)
+                for i, fn in enumerate(fns):
+                    report.add('Exp {}'.format(i), fn, {'run': 1})
+                return report.build()
+            
+            self.assertEqual(build(), 2)
+            with open(out_fn, encoding='utf-8') as f:
+                doc = f.read()
+            self.assertEqual(doc.count('<svg'), 2)
+            self.assertEqual(doc.count('<section'), 2)
+            self.assertIn('<th>A</th>', doc)
+            self.assertTrue(os.path.exists(out_fn + '.cache.pickle'))
+            
+            # Unchanged sections are reused.
+            self.assertEqual(build(), 0)
+            with open(out_fn, encoding='utf-8') as f:
+                self.assertEqual(f.read(), doc)
+            
+            write_plotdata(fns[1], 10)
+            self.assertEqual(build(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Unit tests for suite.py."""
+
+
+import unittest
+import os
+import pickle
+import io
+import tempfile
+import threading
+from functools import partial
+
+from frexp.workflow import Workflow
+from frexp.datagen import Datagen
+from frexp.driver import Driver
+from frexp.extractor import SimpleExtractor
+from frexp.expworkflow import ExpWorkflow
+from frexp.events import JSONLinesSink
+from frexp.live import LivePlotter
+from frexp.suite import *
+from frexp.suite import run_phase
+
+
+def report_affinity(filename):
+    cores = (sorted(os.sched_getaffinity(0))
+             if hasattr(os, 'sched_getaffinity') else None)
+    with open(filename, 'wb') as f:
+        pickle.dump(cores, f)
+
+
+class LabelWorkflow(Workflow):
+    
+    label = 'default'
+    
+    def generate(self):
+        self.print(self.label)
+        self.emit('dataset_done', index=1, total=1, dsid='a', size=0)
+
+
+def set_label(workflow, label):
+    workflow.label = label
+
+
+class CountDatagen(Datagen):
+    
+    progs = ['a', 'b']
+    
+    def get_dsparams_list(self):
+        return [dict(dsid=str(n), x=n) for n in range(1, 4)]
+    
+    def generate(self, dsparams):
+        return dict(dsparams=dsparams)
+
+
+class CountDriver(Driver):
+    
+    loops = 1
+    
+    def operation(self):
+        return self.dataset['dsparams']['x']
+
+
+class CountWorkflow(ExpWorkflow):
+    
+    ExpDatagen = CountDatagen
+    ExpExtractor = SimpleExtractor
+    ExpDriver = CountDriver
+    do_repeats = False
+    require_ac = False
+
+
+class SuiteCase(unittest.TestCase):
+    
+    def test_core_scheduler(self):
+        sched = CoreScheduler([0])
+        with sched.core() as core:
+            self.assertEqual(core, 0)
+            # The only core is taken, so another trial must wait.
+            acquired = threading.Event()
+            def job():
+                with sched.core():
+                    acquired.set()
+            t = threading.Thread(target=job)
+            t.start()
+            self.assertFalse(acquired.wait(0.1))
+        t.join()
+        self.assertTrue(acquired.is_set())
+    
+    def test_run_process(self):
+        sched = CoreScheduler([0])
+        with tempfile.TemporaryDirectory() as d:
+            fn = os.path.join(d, 'out.pickle')
+            exitcode = sched.run_process(report_affinity, (fn,))
+            self.assertEqual(exitcode, 0)
+            with open(fn, 'rb') as f:
+                cores = pickle.load(f)
+        if cores is not None:
+            self.assertEqual(cores, [0])
+    
+    def test_configure(self):
+        out = io.StringIO()
+        suite = Suite([LabelWorkflow('p')], workers=1,
+                      configure=partial(set_label, label='configured'),
+                      fout=out)
+        suite.run(['generate'])
+        self.assertIn('configured', out.getvalue())
+        
+        with tempfile.TemporaryDirectory() as d:
+            fn = os.path.join(d, 'events.jsonl')
+            def configure(workflow):
+                workflow.event_sinks.append(JSONLinesSink(fn, 3600))
+            run_phase(LabelWorkflow, 'p', 'generate', configure)
+            # The sink was closed, writing out its buffered event.
+            with open(fn) as f:
+                self.assertEqual(len(f.readlines()), 1)
+    
+    def test_concurrent_trials(self):
+        with tempfile.TemporaryDirectory() as d:
+            wf = CountWorkflow(os.path.join(d, 'count'), fout=io.StringIO())
+            wf.generate()
+            # Two slots on one core, so that trials overlap.
+            wf.runner.scheduler = CoreScheduler([0, 0])
+            notified = []
+            wf.runner.listeners.append(
+                lambda dp: notified.append((threading.current_thread(), dp)))
+            wf.benchmark()
+            with open(wf.data_filename, 'rb') as f:
+                datapoints = pickle.load(f)
+            with open(wf.params_filename, 'rb') as f:
+                tparams_list = pickle.load(f)
+        self.assertEqual([(p['tid'], p['prog']) for p in datapoints],
+                         [(t['tid'], t['prog']) for t in tparams_list])
+        # Status output is printed in trial order.
+        lines = [line for line in wf.fout.getvalue().splitlines()
+                 if line.startswith('Running test')]
+        self.assertEqual([line.split()[2] for line in lines],
+                         [str(i) for i in range(1, 7)])
+        # Listeners are called from this thread, in trial order.
+        self.assertEqual({t for t, _dp in notified},
+                         {threading.current_thread()})
+        self.assertEqual([dp for _t, dp in notified], datapoints + [None])
+    
+    def test_no_live_plot(self):
+        wf = CountWorkflow('count', fout=io.StringIO())
+        live = LivePlotter(wf.extractor)
+        other = lambda dp: None
+        wf.runner.listeners.extend([live, other])
+        attached = []
+        wf.benchmark = lambda: attached.extend(wf.runner.listeners)
+        suite = Suite([wf], workers=1, fout=io.StringIO())
+        suite.run(['benchmark'])
+        self.assertEqual(attached, [other])
+        self.assertEqual(wf.runner.listeners, [live, other])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 
 
 import unittest
+import sys
 
 from frexp.util import *
 
@@ -52,6 +53,157 @@ class UtilCase(unittest.TestCase):
         with self.assertRaises(AssertionError):
             t.stop()
             t.stop()
+    
+    def test_multistopwatch(self):
+        n = 10
+        m = 100
+        t = MultiStopWatch({'a': lambda: n, 'b': lambda: m},
+                           calibrate=False)
+        self.assertEqual(t.elapsed_ns, {'a': 0, 'b': 0})
+        
+        with t:
+            n = 13
+            m = 110
+            self.assertEqual(t.elapsed_ns, {'a': 3, 'b': 10})
+        with t:
+            n = 15
+        self.assertEqual(t.elapsed_ns, {'a': 5, 'b': 10})
+        self.assertEqual(t.elapsed, {'a': 5e-9, 'b': 10e-9})
+        
+        # Overhead is subtracted once per interval.
+        t.overhead = [1, 4]
+        self.assertEqual(t.elapsed_ns, {'a': 3, 'b': 2})
+        with t:
+            n = 16
+        self.assertEqual(t.elapsed_ns, {'a': 3, 'b': 0})
+        
+        with t:
+            n = 20
+            v = t.consume()
+            n = 22
+        self.assertEqual(v, {'a': 7e-9, 'b': 0})
+        self.assertEqual(t.elapsed_ns, {'a': 1, 'b': 0})
+        
+        t = MultiStopWatch({'a': lambda: n}, calibrate=False)
+        with self.assertRaises(AssertionError):
+            t.stop()
+    
+    def test_multistopwatch_real(self):
+        t = MultiStopWatch()
+        self.assertTrue(all(o >= 0 for o in t.overhead))
+        with t:
+            sum(range(10000))
+        e = t.elapsed
+        self.assertEqual(set(e), {'wall', 'process', 'thread', 'children'})
+        self.assertGreater(e['wall'], 0)
+        self.assertTrue(all(v >= 0 for v in e.values()))
+
+    
+    def test_fingerprint(self):
+        def f(x):
+            return x + 1
+        def g(x):
+            return x + 2
+        self.assertEqual(fingerprint(f, 1, [2]), fingerprint(f, 1, [2]))
+        self.assertNotEqual(fingerprint(f), fingerprint(g))
+        self.assertNotEqual(fingerprint(1), fingerprint(2))
+        
+        class A:
+            n = 1
+            def f(self):
+                return 1
+        class B(A):
+            pass
+        class C(A):
+            n = 2
+        class D(A):
+            def f(self):
+                return 2
+        self.assertEqual(fingerprint(A), fingerprint(B))
+        self.assertNotEqual(fingerprint(A), fingerprint(C))
+        self.assertNotEqual(fingerprint(A), fingerprint(D))
+        
+        # Classes that refer to each other.
+        class E:
+            pass
+        class F:
+            other = E
+        E.other = F
+        self.assertEqual(fingerprint(E), fingerprint(E))
+        self.assertNotEqual(fingerprint(E), fingerprint(F))
+        
+        # Functions in containers, and instances, don't fingerprint by
+        # address.
+        class G:
+            funcs = [f]
+            options = {'key': object()}
+        fp = fingerprint(G)
+        G.options = {'key': object()}
+        self.assertEqual(fingerprint(G), fp)
+        G.funcs = [g]
+        self.assertNotEqual(fingerprint(G), fp)
+        self.assertNotEqual(fingerprint([1]), fingerprint((1,)))
+
+    
+    def test_deep_getsizeof(self):
+        size = sys.getsizeof
+        
+        # Shared objects and cycles are counted once.
+        s = 'x' * 100
+        l = [s, s]
+        self.assertEqual(deep_getsizeof(l), size(l) + size(s))
+        l.append(l)
+        self.assertEqual(deep_getsizeof(l), size(l) + size(s))
+        
+        d = {'a': s}
+        self.assertEqual(deep_getsizeof(d),
+                         size(d) + size('a') + size(s))
+        
+        # Instance dicts and slots.
+        class A:
+            def __init__(self):
+                self.v = s
+        class B:
+            __slots__ = ['v', 'w']
+            def __init__(self):
+                self.v = s
+        a = A()
+        self.assertEqual(deep_getsizeof(a),
+                         size(a) + size(a.__dict__) + size('v') + size(s))
+        b = B()
+        self.assertEqual(deep_getsizeof(b), size(b) + size(s))
+        
+        # Deep nesting doesn't overflow the stack.
+        deep = []
+        for _ in range(100000):
+            deep = [deep]
+        self.assertEqual(deep_getsizeof(deep),
+                         100000 * size([[]]) + size([]))
+        
+        # Custom handlers.
+        class C:
+            def __init__(self):
+                self.items = [s]
+        c = C()
+        self.assertEqual(deep_getsizeof(c, {C: lambda o: o.items}),
+                         size(c) + size(s))
+        # Even for atomic types.
+        t = 'abc'
+        self.assertEqual(deep_getsizeof([t], {str: lambda o: [s]}),
+                         size([t]) + size(t) + size(s))
+    
+    def test_deep_getsizeof_numpy(self):
+        import numpy as np
+        a = np.zeros(1000)
+        # A view's data is counted once, with its base.
+        self.assertEqual(deep_getsizeof([a, a[10:]]),
+                         sys.getsizeof([a, a[10:]]) + sys.getsizeof(a) +
+                         sys.getsizeof(a[10:]))
+        
+        s = 'x' * 100
+        o = np.array([s, s, None], dtype=object)
+        self.assertEqual(deep_getsizeof(o), sys.getsizeof(o) +
+                         sys.getsizeof(s) + sys.getsizeof(None))
 
 
 if __name__ == '__main__':
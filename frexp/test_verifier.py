@@ -0,0 +1,126 @@
+"""Unit tests for verifier.py."""
+
+
+import unittest
+import os
+import io
+import pickle
+import tempfile
+
+from frexp.driver import Driver
+from frexp.datagen import Datagen
+from frexp.extractor import SimpleExtractor
+from frexp.expworkflow import ExpWorkflow
+from frexp.verifier import *
+
+
+class SquaresDatagen(Datagen):
+    
+    progs = ['set', 'reversed', 'bad']
+    
+    def get_dsparams_list(self):
+        return [dict(dsid=str(n), x=n) for n in [5, 10]]
+    
+    def generate(self, dsparams):
+        return dict(dsparams=dsparams, n=dsparams['x'])
+
+
+class SquaresDriver(Driver):
+    
+    loops = 1
+    
+    def operation(self):
+        n = self.dataset['n']
+        if self.prog == 'set':
+            return {i * i for i in range(n)}
+        elif self.prog == 'reversed':
+            return set(i * i for i in reversed(range(n)))
+        else:
+            return {i * i for i in range(n - 1)}
+
+
+def exit_driver(pipe_fn):
+    os._exit(3)
+
+
+def silent_driver(pipe_fn):
+    with open(pipe_fn, 'wb') as pf:
+        pickle.dump({'stdmetric': 1.0}, pf)
+
+
+class VerifierCase(unittest.TestCase):
+    
+    def test_canonical_digest(self):
+        a = {'x': {1, 2, 3}, 'y': [frozenset({(1, 2), (3, 4)})]}
+        b = {'y': [frozenset({(3, 4), (1, 2)})], 'x': {3, 2, 1}}
+        self.assertEqual(canonical_digest(a), canonical_digest(b))
+        self.assertEqual(canonical_digest({1, 2.0}), canonical_digest({1, 2}))
+        self.assertNotEqual(canonical_digest([1, 2]), canonical_digest([2, 1]))
+        self.assertNotEqual(canonical_digest([1, 2]), canonical_digest((1, 2)))
+        self.assertNotEqual(canonical_digest({1: 2}), canonical_digest({2: 1}))
+        self.assertNotEqual(canonical_digest({'a'}), canonical_digest({'b'}))
+    
+    def test_verify_driver(self):
+        with tempfile.TemporaryDirectory() as d:
+            class W(ExpWorkflow):
+                ExpDatagen = SquaresDatagen
+                ExpExtractor = SimpleExtractor
+                ExpVerifyDriver = SquaresDriver
+            wf = W(os.path.join(d, 'sq'), fout=io.StringIO())
+            wf.generate()
+            with open(wf.params_filename, 'rb') as f:
+                tparams_list = pickle.load(f)
+            with open(wf.data_filename, 'wb') as f:
+                pickle.dump([dict(tid=t['tid'], prog=t['prog'])
+                             for t in tparams_list], f)
+            
+            wf.verifier.stop_on_mismatch = False
+            wf.verify()
+            # Only the bad prog disagrees, in both trial groups.
+            self.assertEqual(len(wf.verifier.mismatches), 2)
+            for mismatch in wf.verifier.mismatches:
+                self.assertIn('prog: bad', mismatch[2])
+            
+            wf.datagen.progs = ['set', 'reversed']
+            wf.generate()
+            wf.verify()
+            self.assertEqual(wf.verifier.mismatches, [])
+            
+            wf.verifier.use_digests = False
+            wf.verify()
+            self.assertEqual(wf.verifier.mismatches, [])
+            
+            wf.verifier.workers = 2
+            wf.verify()
+            self.assertEqual(wf.verifier.mismatches, [])
+            
+            W.ExpVerifyDriver = staticmethod(exit_driver)
+            with self.assertRaisesRegex(ValueError, 'exit code 3'):
+                wf.verify()
+            
+            # A driver without output is reported by the parent.
+            W.ExpVerifyDriver = staticmethod(silent_driver)
+            for use_digests in [True, False]:
+                wf.verifier.use_digests = use_digests
+                with self.assertRaisesRegex(ValueError,
+                                            "no 'output' for prog set"):
+                    wf.verify()
+    
+    def test_fused_verify_no_output(self):
+        with tempfile.TemporaryDirectory() as d:
+            class W(ExpWorkflow):
+                ExpDatagen = SquaresDatagen
+                ExpExtractor = SimpleExtractor
+                ExpDriver = staticmethod(silent_driver)
+                fused_verify = True
+                do_repeats = False
+                require_ac = False
+            wf = W(os.path.join(d, 'sq'), fout=io.StringIO())
+            wf.generate()
+            wf.benchmark()
+            self.assertIn('Warning: No output from set to verify',
+                          wf.fout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
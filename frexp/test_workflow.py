@@ -0,0 +1,125 @@
+"""Unit tests for workflow.py."""
+
+
+import unittest
+import os
+import io
+import tempfile
+
+from frexp.workflow import *
+
+
+class Copy(Task):
+    
+    """Copy the source file to the middle file."""
+    
+    @property
+    def inputs(self):
+        return [self.workflow.src]
+    
+    @property
+    def outputs(self):
+        return [self.workflow.mid]
+    
+    def run(self):
+        self.workflow.runs.append(type(self).__name__)
+        with open(self.workflow.src) as in_file, \
+             open(self.workflow.mid, 'w') as out_file:
+            out_file.write(in_file.read())
+
+
+class Upper(Task):
+    
+    @property
+    def inputs(self):
+        return [self.workflow.mid]
+    
+    @property
+    def outputs(self):
+        return [self.workflow.dst]
+    
+    def run(self):
+        self.workflow.runs.append(type(self).__name__)
+        with open(self.workflow.mid) as in_file, \
+             open(self.workflow.dst, 'w') as out_file:
+            out_file.write(in_file.read().upper())
+
+
+class WorkflowCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        prefix = os.path.join(self.dir.name, 'test')
+        
+        class W(Workflow):
+            skip_fresh = True
+            src = prefix + '_src.txt'
+            mid = prefix + '_mid.txt'
+            dst = prefix + '_dst.txt'
+            def __init__(self):
+                super().__init__(prefix, fout=io.StringIO())
+                self.runs = []
+                self.tasks = [Copy(self), Upper(self)]
+        
+        self.wf = W()
+        self.write_src('abc')
+    
+    def tearDown(self):
+        self.dir.cleanup()
+    
+    def counts(self):
+        return (self.wf.runs.count('Copy'), self.wf.runs.count('Upper'))
+    
+    def write_src(self, text):
+        with open(self.wf.src, 'w') as f:
+            f.write(text)
+    
+    def test_skip_fresh(self):
+        wf = self.wf
+        wf.run()
+        self.assertEqual(self.counts(), (1, 1))
+        
+        # Nothing changed.
+        wf.run()
+        self.assertEqual(self.counts(), (1, 1))
+        
+        # Changed input re-runs downstream tasks.
+        self.write_src('abcd')
+        wf.run()
+        self.assertEqual(self.counts(), (2, 2))
+        with open(wf.dst) as f:
+            self.assertEqual(f.read(), 'ABCD')
+        
+        # Rewriting the same contents re-runs only the first task,
+        # since its output is unchanged.
+        self.write_src('abcd')
+        os.remove(wf.mid)
+        wf.run()
+        self.assertEqual(self.counts(), (3, 2))
+        
+        # Missing output.
+        os.remove(wf.dst)
+        wf.run()
+        self.assertEqual(self.counts(), (3, 3))
+        
+        wf.run(force=True)
+        self.assertEqual(self.counts(), (4, 4))
+        
+        wf.cleanup()
+        self.assertFalse(os.path.exists(wf.stamps_filename))
+    
+    def test_mtime(self):
+        wf = self.wf
+        wf.freshness = 'mtime'
+        wf.run()
+        wf.run()
+        self.assertEqual(self.counts(), (1, 1))
+        
+        st = os.stat(wf.src)
+        os.utime(wf.src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        wf.run()
+        self.assertEqual(self.counts(), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
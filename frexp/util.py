@@ -3,15 +3,24 @@
 
 __all__ = [
     'StopWatch',
+    'MultiStopWatch',
     'user_time',
     'on_battery_power',
     'get_mem_usage',
+    'get_peak_mem_usage',
+    'thread_safe_context',
+    'fingerprint',
+    'file_digest',
+    'deep_getsizeof',
 ]
 
 
 import time
 import sys
 import os
+import hashlib
+import types
+import multiprocessing
 
 
 class StopWatch:
@@ -21,7 +30,7 @@ class StopWatch:
     the body of the With block.
     """
     
-    def __init__(self, timefunc=time.clock):
+    def __init__(self, timefunc=time.perf_counter):
         self.timefunc = timefunc
         """Timing function. Must return a monotonically increasing
         numerical value.
@@ -80,6 +89,145 @@ class StopWatch:
         self.stop()
 
 
+def children_time_ns():
+    """Total user and system time of terminated child processes, in
+    nanoseconds.
+    """
+    t = os.times()
+    return int((t.children_user + t.children_system) * 1e9)
+
+
+clock_funcs = {
+    'wall': time.perf_counter_ns,
+    'process': time.process_time_ns,
+    'thread': time.thread_time_ns,
+    'children': children_time_ns,
+}
+"""Named clocks available to MultiStopWatch, as functions returning
+integer nanoseconds.
+"""
+
+
+class MultiStopWatch:
+    
+    """Resumable timer that reads several clocks at once, with the same
+    start()/stop()/elapsed/consume()/context manager interface as
+    StopWatch. Times are reported as dicts from clock name to seconds
+    (or nanoseconds, for elapsed_ns).
+    
+    The cost of starting and stopping the timer itself is measured
+    once per set of clocks, and subtracted from each timed interval.
+    Reported times are never negative. Reading fewer clocks is cheaper:
+    for very short regions use e.g. clocks=['wall'].
+    """
+    
+    calibration_rounds = 1000
+    
+    _overheads = {}
+    """Map from tuple of clock functions to list of per-interval
+    overheads in nanoseconds.
+    """
+    
+    def __init__(self, clocks=('wall', 'process', 'thread', 'children'),
+                 calibrate=True):
+        if isinstance(clocks, dict):
+            self.names = list(clocks.keys())
+            self.funcs = list(clocks.values())
+        else:
+            self.names = list(clocks)
+            self.funcs = [clock_funcs[name] for name in self.names]
+        
+        self.running = False
+        self.raw = [0] * len(self.funcs)
+        """Accumulated uncorrected nanoseconds for each clock."""
+        self.intervals = 0
+        """Number of completed start/stop intervals in raw."""
+        self.checkpoint = None
+        
+        self.overhead = [0] * len(self.funcs)
+        """Nanoseconds subtracted per interval, for each clock."""
+        if calibrate:
+            self.overhead = self.calibrate()
+    
+    # Invariant: Result = raw + (current readings - checkpoint)
+    #                     - intervals * overhead
+    
+    def read(self):
+        return [f() for f in self.funcs]
+    
+    def calibrate(self):
+        """Return the minimum time each clock measures for an empty
+        interval, caching the result for this set of clocks.
+        """
+        key = tuple(self.funcs)
+        if key not in self._overheads:
+            probe = MultiStopWatch(dict(zip(self.names, self.funcs)),
+                                   calibrate=False)
+            best = None
+            for _ in range(self.calibration_rounds):
+                probe.start()
+                probe.stop()
+                if best is None:
+                    best = probe.raw
+                else:
+                    best = [min(a, b) for a, b in zip(best, probe.raw)]
+                probe.raw = [0] * len(self.funcs)
+            self._overheads[key] = best
+        return self._overheads[key]
+    
+    def start(self):
+        """Start running. Must be currently stopped."""
+        assert not self.running
+        self.running = True
+        self.checkpoint = self.read()
+    
+    def _propagate(self):
+        t = self.read()
+        self.raw = [r + b - a for r, a, b in
+                    zip(self.raw, self.checkpoint, t)]
+        self.checkpoint = t
+    
+    @property
+    def elapsed_ns(self):
+        """Return a dict of elapsed nanoseconds, whether or not
+        running.
+        """
+        if self.running:
+            self._propagate()
+        return {name: max(0, r - self.intervals * o)
+                for name, r, o in zip(self.names, self.raw, self.overhead)}
+    
+    @property
+    def elapsed(self):
+        """Return a dict of elapsed seconds, whether or not running."""
+        return {name: ns / 1e9 for name, ns in self.elapsed_ns.items()}
+    
+    def consume(self):
+        """Return elapsed seconds and reset to 0, whether or not
+        already running.
+        """
+        res = self.elapsed
+        self.raw = [0] * len(self.funcs)
+        self.intervals = 0
+        return res
+    
+    def stop(self):
+        """Stop running. Must be currently running."""
+        t = self.read()
+        assert self.running
+        self.raw = [r + b - a for r, a, b in
+                    zip(self.raw, self.checkpoint, t)]
+        self.intervals += 1
+        self.running = False
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
 def user_time():
     return os.times()[0]
 
@@ -123,13 +271,263 @@ def on_battery_power():
 
 
 def get_mem_usage():
-    """Return total process memory usage, in bytes.
-    Requires the psutil package (https://code.google.com/p/psutil/);
-    returns 0 if not available.
+    """Return the current resident set size of this process, in bytes.
+    Read from /proc/self/statm where available (Linux). Elsewhere,
+    fall back on the peak resident set size reported by getrusage(),
+    which is an upper bound. Raise NotImplementedError if neither is
+    available (e.g. on Windows).
+    """
+    try:
+        with open('/proc/self/statm', 'rt') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    return get_peak_mem_usage()
+
+
+def get_peak_mem_usage():
+    """Return the peak resident set size of this process, in bytes,
+    using getrusage(). Raise NotImplementedError if not available.
     """
     try:
-        import psutil
+        import resource
     except ImportError:
-        return 0
-    process = psutil.Process(os.getpid())
-    return process.get_memory_info().vms
+        raise NotImplementedError('Memory usage is not available '
+                                  'on this platform') from None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def thread_safe_context():
+    """Return a multiprocessing context for starting child processes
+    from threads other than the main one. Forking a process that has
+    several threads can deadlock the child on a lock held by another
+    thread, so the 'forkserver' start method is used where available,
+    and 'spawn' otherwise. Either way, process targets and their
+    arguments must be pickleable.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        # Spare each child importing frexp (and numpy) anew. Takes
+        # effect when the fork server starts.
+        ctx.set_forkserver_preload(['frexp'])
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+def _code_bytes(code):
+    """Serialize the parts of a code object that determine its
+    behavior.
+    """
+    parts = [code.co_code, repr(code.co_names).encode()]
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            parts.append(_code_bytes(c))
+        else:
+            parts.append(repr(c).encode())
+    return b'\0'.join(parts)
+
+
+def _class_bytes(cls, seen):
+    """Serialize the methods and class-level attributes of a class and
+    its bases.
+    """
+    parts = []
+    for klass in cls.__mro__:
+        if klass is object:
+            continue
+        for name, value in sorted(vars(klass).items()):
+            if isinstance(value, (staticmethod, classmethod)):
+                value = value.__func__
+            elif isinstance(value, property):
+                value = value.fget
+            if getattr(value, '__code__', None) is None and \
+                    name.startswith('__'):
+                continue
+            parts.append(name.encode())
+            parts.append(_value_bytes(value, seen))
+    return b'\0'.join(parts)
+
+
+def _value_bytes(v, seen):
+    """Serialize a value for fingerprint(). seen is the set of classes
+    already serialized, which are referred to by name when met again.
+    """
+    func = getattr(v, '__func__', v)
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        return _code_bytes(code)
+    elif isinstance(v, type) and v.__module__ != 'builtins':
+        if v in seen:
+            return '<ref {}.{}>'.format(v.__module__,
+                                        v.__qualname__).encode()
+        seen.add(v)
+        return _class_bytes(v, seen)
+    elif isinstance(v, (list, tuple)):
+        parts = [_value_bytes(x, seen) for x in v]
+    elif isinstance(v, dict):
+        parts = [_value_bytes(x, seen) for item in v.items() for x in item]
+    elif isinstance(v, (set, frozenset)):
+        parts = sorted(_value_bytes(x, seen) for x in v)
+    elif type(v).__repr__ is object.__repr__:
+        # The default repr includes the address, which changes with
+        # each run.
+        return '<{}.{} object>'.format(type(v).__module__,
+                                       type(v).__qualname__).encode()
+    else:
+        return repr(v).encode()
+    return b'\0'.join([type(v).__name__.encode(), b'('] + parts + [b')'])
+
+
+def fingerprint(*values):
+    """Return a hex digest identifying the given values, for use as
+    a cache key. Functions and methods are identified by their bytecode,
+    constants, and referenced names, so that editing them changes the
+    fingerprint. Classes are identified by their methods and class
+    attributes, including those of their bases. Lists, tuples, dicts,
+    and sets are identified by their elements. Instances of classes
+    without a __repr__ are identified by their class's name only, and
+    other values by their repr(). Values whose repr() differs between
+    processes, e.g. because it includes an address, defeat the use of
+    the fingerprint across runs.
+    """
+    h = hashlib.sha1()
+    for v in values:
+        h.update(_value_bytes(v, set()))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def file_digest(filename, blocksize=1 << 20):
+    """Return a hex digest of the contents of the given file."""
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# Types whose instances refer to no other objects worth counting.
+_atomic_types = {int, float, complex, bool, str, bytes, bytearray,
+                 range, type(None), type(Ellipsis), type(NotImplemented)}
+
+# Types whose instances are shared program structure rather than data,
+# and are neither counted nor traversed.
+_skipped_types = (type, types.ModuleType, types.FunctionType,
+                  types.BuiltinFunctionType, types.MethodType,
+                  types.CodeType, types.FrameType)
+
+_SKIP = object()
+
+
+def _ndarray_children(a):
+    # An array's getsizeof() includes its data only if it owns it, so
+    # traversing the base counts a view's data once. Object arrays hold
+    # references to their elements.
+    children = [] if a.base is None else [a.base]
+    if a.dtype.hasobject:
+        children.extend(a.flat)
+    return children
+
+
+def _slot_names(t):
+    names = []
+    for klass in t.__mro__:
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = [slots]
+        names.extend(s for s in slots
+                     if s not in ('__dict__', '__weakref__'))
+    return names
+
+
+def _get_handler(t, handlers):
+    """Return the function giving the children of instances of type t,
+    None if they have no children, or _SKIP.
+    """
+    if issubclass(t, _skipped_types):
+        return _SKIP
+    for ht, h in handlers.items():
+        if issubclass(t, ht):
+            return h
+    
+    if issubclass(t, dict):
+        base = lambda d: [*d.keys(), *d.values()]
+    elif issubclass(t, (list, tuple, set, frozenset)):
+        base = list
+    else:
+        np = sys.modules.get('numpy', None)
+        if np is not None and issubclass(t, np.ndarray):
+            return _ndarray_children
+        base = None
+    
+    slots = _slot_names(t)
+    has_dict = '__dict__' in dir(t) and t not in (dict, list, tuple, set,
+                                                  frozenset)
+    if not slots and not has_dict:
+        return base
+    
+    def children(o):
+        result = base(o) if base is not None else []
+        if has_dict:
+            d = getattr(o, '__dict__', None)
+            if d is not None:
+                result.append(d)
+        for s in slots:
+            try:
+                result.append(getattr(o, s))
+            except AttributeError:
+                pass
+        return result
+    return children
+
+
+def deep_getsizeof(obj, handlers=None):
+    """Return the total size in bytes, as given by sys.getsizeof(), of
+    obj and all objects reachable from it through containers (dict,
+    list, tuple, set, frozenset, and their subclasses), instance
+    __dict__s and __slots__, and NumPy arrays (counting each data
+    buffer once, and the elements of object arrays). Each object is
+    counted once even if shared or part of a cycle. Classes, modules,
+    and functions are not counted.
+    
+    handlers is an optional dict mapping types to functions that
+    return the referents of instances of that type (including
+    subclasses), overriding the default traversal.
+    
+    Traversal is iterative, so deep structures do not overflow the
+    stack. Memory use is proportional to the number of objects.
+    """
+    handlers = dict(handlers or {})
+    # Atomic types take a shortcut, unless a handler covers them.
+    type_handlers = dict.fromkeys(
+        t for t in _atomic_types
+        if not any(issubclass(t, ht) for ht in handlers))
+    getsizeof = sys.getsizeof
+    seen = set()
+    seen_add = seen.add
+    stack = [obj]
+    pop = stack.pop
+    extend = stack.extend
+    total = 0
+    
+    while stack:
+        o = pop()
+        i = id(o)
+        if i in seen:
+            continue
+        seen_add(i)
+        t = type(o)
+        try:
+            h = type_handlers[t]
+        except KeyError:
+            h = type_handlers[t] = _get_handler(t, handlers)
+        if h is _SKIP:
+            continue
+        total += getsizeof(o)
+        if h is not None:
+            extend(h(o))
+    
+    return total
@@ -2,19 +2,121 @@
 
 
 __all__ = [
+    'canonical_digest',
+    'DigestingDriver',
     'Verifier',
 ]
 
 
 import pickle
+import hashlib
 from itertools import groupby
 from operator import itemgetter
 import os
-from multiprocessing import Process
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
+from frexp.util import thread_safe_context
 from frexp.workflow import Task
 
 
+def _canonical_bytes(obj):
+    """Return a bytestring that is equal for equal values, regardless
+    of the iteration order of any sets or dicts within them.
+    Elements of containers are reduced to fixed-size digests, so
+    unordered containers are canonicalized by sorting digests.
+    """
+    if isinstance(obj, (set, frozenset)):
+        parts = sorted(_element_digest(x) for x in obj)
+        return b'set:' + b''.join(parts)
+    elif isinstance(obj, dict):
+        parts = sorted(_element_digest(k) + _element_digest(v)
+                       for k, v in obj.items())
+        return b'dict:' + b''.join(parts)
+    elif isinstance(obj, (list, tuple)):
+        tag = b'list:' if isinstance(obj, list) else b'tuple:'
+        return tag + b''.join(_element_digest(x) for x in obj)
+    elif isinstance(obj, (bool, int)):
+        return b'num:' + repr(int(obj)).encode()
+    elif isinstance(obj, float):
+        # Agree with ints that compare equal.
+        if obj.is_integer():
+            return b'num:' + repr(int(obj)).encode()
+        return b'num:' + repr(obj).encode()
+    else:
+        return type(obj).__name__.encode() + b':' + repr(obj).encode()
+
+def _element_digest(obj):
+    return hashlib.sha1(_canonical_bytes(obj)).digest()
+
+def canonical_digest(obj):
+    """Return a hex digest of obj that is insensitive to the iteration
+    order of sets and dicts, recursively. Values that compare equal
+    get equal digests, provided any objects other than builtin
+    containers and numbers have a deterministic repr().
+    """
+    return _element_digest(obj).hex()
+
+
+class DigestingDriver:
+    
+    """Wrapper for a driver, called in the child process, so that only
+    the canonical digest of the output, 'output_digest', is sent back
+    to the parent rather than the output itself.
+    
+    Callers also set trial param 'digest_output'. Drivers that honor
+    it (as driver.Driver does) digest the output before writing their
+    results, so that it is never pickled. For other drivers, the output
+    is replaced by its digest after they write their results. Results
+    without output are left alone, for the parent to report.
+    """
+    
+    def __init__(self, driver):
+        self.driver = driver
+    
+    def __call__(self, pipe_fn):
+        self.driver(pipe_fn)
+        with open(pipe_fn, 'rb') as pf:
+            results = pickle.load(pf)
+        if 'output_digest' in results or 'output' not in results:
+            return
+        output = results.pop('output')
+        results['output_digest'] = canonical_digest(output)
+        with open(pipe_fn, 'wb') as pf:
+            pickle.dump(results, pf)
+
+
+def describe_diff(goal, output, limit=5):
+    """Return a list of lines describing how output differs from goal."""
+    def short(x):
+        r = repr(x)
+        return r if len(r) <= 80 else r[:77] + '...'
+    
+    if (isinstance(goal, (set, frozenset)) and
+        isinstance(output, (set, frozenset))):
+        missing = goal - output
+        extra = output - goal
+        return ['{} missing, e.g. {}'.format(
+                    len(missing), short(list(missing)[:limit])),
+                '{} extra, e.g. {}'.format(
+                    len(extra), short(list(extra)[:limit]))]
+    elif isinstance(goal, dict) and isinstance(output, dict):
+        keys = [k for k in goal.keys() | output.keys()
+                if goal.get(k, None) != output.get(k, None)]
+        return ['{} differing keys, e.g. {}'.format(
+                    len(keys), short(keys[:limit]))]
+    elif (isinstance(goal, (list, tuple)) and
+          isinstance(output, (list, tuple))):
+        for i, (g, o) in enumerate(zip(goal, output)):
+            if g != o:
+                return ['first difference at index {}: {} vs {}'.format(
+                        i, short(g), short(o))]
+        return ['lengths differ: {} vs {}'.format(len(goal), len(output))]
+    else:
+        return ['{} vs {}'.format(short(goal), short(output))]
+
+
 class Verifier(Task):
     
     """Run each test once and ensure that different progs agree
@@ -26,31 +128,117 @@ class Verifier(Task):
     # more memory as the number of tests increases, and it also avoids
     # additional unnecessary serialization work.
     
-    # TODO: If it turns out that equality comparison among large sets
-    # ends up being a limiting factor, we can turn this into a hash-
-    # based or sort-based equality. This would probably require a
-    # recursive traversal, similar to how canonization is done. 
+    # Outputs are compared by canonical digest, computed in the child
+    # process (see DigestingDriver). Only when digests disagree are the
+    # full outputs fetched, by re-running both progs, to describe the
+    # difference.
+    
+    use_digests = True
+    """If False, send full outputs back from the child and compare
+    them directly.
+    """
+    
+    workers = 1
+    """Number of trial groups to verify concurrently. Each group runs
+    its progs one after another in child processes.
+    """
+    
+    stop_on_mismatch = True
+    """If True, stop at the first trial group (in tid order) whose
+    outputs disagree. Otherwise verify all groups and report every
+    mismatch.
+    """
     
     # Copied from Runner, should refactor.
     
-    def dispatch_test(self, dataset, prog, other_tparams):
-        """Spawn a driver process and get its result."""
+    def dispatch_test(self, dataset, prog, other_tparams, *,
+                      digest, pipe_fn=None):
+        """Spawn a driver process and get its result. The driver is
+        passed trial param 'verify_output' set to True, and if digest
+        is True, 'digest_output' as well.
+        """
         # Communicate the dataset and results via a temporary
         # pipe file.
-        pipe_fn = self.workflow.pipe_filename
+        if pipe_fn is None:
+            pipe_fn = self.workflow.pipe_filename
+        other_tparams = dict(other_tparams, verify_output=True,
+                             digest_output=digest)
         with open(pipe_fn, 'wb') as pf:
             pickle.dump((dataset, prog, other_tparams), pf)
         
-        child = Process(target=self.workflow.ExpVerifyDriver, args=(pipe_fn,))
+        target = self.workflow.ExpVerifyDriver
+        if digest:
+            target = DigestingDriver(target)
+        # Concurrent groups start processes from worker threads.
+        context = (thread_safe_context() if self.workers > 1
+                   else multiprocessing)
+        child = context.Process(target=target, args=(pipe_fn,))
         child.start()
         
         child.join()
+        if child.exitcode != 0:
+            raise ValueError('Child failed with exit code ' +
+                             str(child.exitcode))
         with open(pipe_fn, 'rb') as pf:
             results = pickle.load(pf)
         
         os.remove(pipe_fn)
         return results
     
+    def verify_group(self, tid, tgs, datapoint_tidprogs, pipe_fn, out):
+        """Run each trial of a group and compare outputs. Progress text
+        is appended to the list out. Return a description of the
+        mismatch as a list of lines, or None if outputs agree.
+        """
+        goal = None
+        goalprog = None
+        for trial in tgs:
+            trial = dict(trial)
+            dsid = trial.pop('dsid')
+            prog = trial.pop('prog')
+            
+            # Skip if this one timed out.
+            if (tid, prog) not in datapoint_tidprogs:
+                out.append('Skipping ' + prog + '  ')
+                continue
+            
+            out.append(prog + '  ')
+            
+            ds_fn = self.workflow.get_ds_filename(dsid)
+            with open(ds_fn, 'rb') as dsfile:
+                dataset = pickle.load(dsfile)
+            
+            results = self.dispatch_test(dataset, prog, trial,
+                                         digest=self.use_digests,
+                                         pipe_fn=pipe_fn)
+            key = 'output_digest' if self.use_digests else 'output'
+            if key not in results:
+                raise ValueError("Driver returned no 'output' for prog " +
+                                 prog + "; it must provide one when trial "
+                                 "param 'verify_output' is set")
+            output = results[key]
+            
+            if goal is None:
+                goal = output
+                goalprog = prog
+                goaltrial = trial
+            elif output != goal:
+                lines = ['Output disagrees for trial group ' + tid,
+                         '  params: ' + str(dataset['dsparams']),
+                         '  goalprog: {}, prog: {}'.format(goalprog, prog)]
+                if self.use_digests:
+                    goal = self.dispatch_test(
+                        dataset, goalprog, goaltrial,
+                        digest=False, pipe_fn=pipe_fn)['output']
+                    output = self.dispatch_test(
+                        dataset, prog, trial,
+                        digest=False, pipe_fn=pipe_fn)['output']
+                lines.extend('  ' + line
+                             for line in describe_diff(goal, output))
+                return lines
+        
+        return None
+    
     def run(self):
         with open(self.workflow.params_filename, 'rb') as in_file:
             tparams_list = pickle.load(in_file)
@@ -64,43 +252,67 @@ class Verifier(Task):
         tgroups = groupby(tparams_list, itemgetter('tid'))
         tgroups = [(tid, list(tgs)) for tid, tgs in tgroups]
         
-        for i, (tid, tgs) in enumerate(tgroups):
-            itemstr = 'Verifying trial group {:<10} ({}/{})\n  '.format(
-                        tid + ' ...', i, len(tgroups))
-            self.print(itemstr, end='')
-            goal = None
-            goalprog = None
-            for trial in tgs:
-                trial = dict(trial)
-                dsid = trial.pop('dsid')
-                prog = trial.pop('prog')
-                
-                # Skip if this one timed out.
-                if (tid, prog) not in datapoint_tidprogs:
-                    print('Skipping ' + prog, end='  ')
-                    continue
-                
-                self.print(prog, end='  ')
-                
-                ds_fn = self.workflow.get_ds_filename(dsid)
-                with open(ds_fn, 'rb') as dsfile:
-                    dataset = pickle.load(dsfile)
-                
-                output = self.dispatch_test(dataset, prog, trial)['output']
-                
-                if goal is None:
-                    goal = output
-                    goalprog = prog
-                else:
-                    if output != goal:
-                        self.print()
-                        self.print('Output disagrees for trial group ' + tid)
-                        self.print('  params: ' + str(dataset['dsparams']))
-                        self.print('  goalprog: {}, prog: {}'.format(
-                                   goalprog, prog))
-                        return
-            
-            self.print()
+        # Index of the earliest mismatching group found so far. When
+        # stopping early, later groups are skipped, but earlier ones
+        # still run, so the reported mismatch doesn't depend on timing.
+        first_mismatch = len(tgroups)
+        lock = threading.Lock()
+        
+        def job(i, tid, tgs):
+            nonlocal first_mismatch
+            if self.stop_on_mismatch and i > first_mismatch:
+                return None, None
+            out = ['Verifying trial group {:<10} ({}/{})\n  '.format(
+                   tid + ' ...', i, len(tgroups))]
+            pipe_fn = (self.workflow.pipe_filename if self.workers <= 1
+                       else self.workflow.get_pipe_filename(i))
+            mismatch = self.verify_group(tid, tgs, datapoint_tidprogs,
+                                         pipe_fn, out)
+            if mismatch is not None:
+                with lock:
+                    first_mismatch = min(first_mismatch, i)
+            return out, mismatch
+        
+        def report(i, out, mismatch):
+            self.print(''.join(out))
+            if mismatch is not None:
+                for line in mismatch:
+                    self.print(line)
+            self.emit('verify_group', index=i, total=len(tgroups),
+                      tid=tgroups[i][0], ok=mismatch is None)
+        
+        mismatches = []
+        if self.workers <= 1:
+            for i, (tid, tgs) in enumerate(tgroups):
+                out, mismatch = job(i, tid, tgs)
+                if out is None:
+                    break
+                report(i, out, mismatch)
+                if mismatch is not None:
+                    mismatches.append(mismatch)
+        else:
+            with ThreadPoolExecutor(self.workers) as executor:
+                futures = [executor.submit(job, i, tid, tgs)
+                           for i, (tid, tgs) in enumerate(tgroups)]
+                # Report in group order as results become available.
+                for i, future in enumerate(futures):
+                    out, mismatch = future.result()
+                    if out is None:
+                        continue
+                    report(i, out, mismatch)
+                    if mismatch is not None:
+                        mismatches.append(mismatch)
+                        if self.stop_on_mismatch:
+                            break
+        
+        # Mismatch descriptions, in trial group order.
+        self.mismatches = mismatches
+        self.emit('verify_end', groups=len(tgroups),
+                  mismatches=len(mismatches))
         
-        self.print('Output agrees on all datasets.')
+        if len(mismatches) == 0:
+            self.print('Output agrees on all datasets.')
+        else:
+            self.print('Output disagrees on {} trial group(s).'.format(
+                       len(mismatches)))
         self.print('Done.')
@@ -24,11 +24,11 @@ class Printer(Task):
             plotdata = pickle.load(in_file)
         
         if plotdata['plot_title']:
-            print(plotdata['plot_title'])
+            self.print(plotdata['plot_title'])
         
         for ax in plotdata['axes']:
             if ax['axes_title']:
-                print(ax['axes_title'])
+                self.print(ax['axes_title'])
             
             series_names = []
             series_data = {}
@@ -60,24 +60,41 @@ class Printer(Task):
                 h, w = len(data), len(data[0])
                 data = [[data[y][x] for y in range(h)]
                         for x in range(w)]
-            print(tabulate(data))
+            self.print(tabulate(data))
 
 
 class Plotter(Task):
     
+    headless = False
+    """If True, only save the figure files, without showing the
+    figure. Also implied when matplotlib uses a non-interactive backend.
+    """
+    
     def run(self):
         # Delay the import until here so if matplotlib can't be loaded
         # we can still do the rest of the testing.
-        from .plot import draw_figure, save_figure
+        from .plot import draw_figure, save_figures, is_headless
         
         with open(self.workflow.plotdata_filename, 'rb') as in_file:
             plotdata = pickle.load(in_file)
         
-        save_figure(plotdata, self.workflow.png_filename)
-        save_figure(plotdata, self.workflow.pdf_filename)
-        draw_figure(plotdata)
+        # Render once for all file formats, and the shown figure.
+        out_filenames = [self.workflow.png_filename,
+                         self.workflow.pdf_filename]
+        if self.headless or is_headless():
+            save_figures(plotdata, out_filenames)
+        else:
+            draw_figure(plotdata, out_filenames)
         self.print('Done.')
     
+    @property
+    def inputs(self):
+        return [self.workflow.plotdata_filename]
+    
+    @property
+    def outputs(self):
+        return [self.workflow.png_filename, self.workflow.pdf_filename]
+    
     def cleanup(self):
         self.remove_file(self.workflow.png_filename)
         self.remove_file(self.workflow.pdf_filename)
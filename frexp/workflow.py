@@ -10,15 +10,31 @@ __all__ = [
 import builtins
 import sys
 import os
+import pickle
+import time
+import threading
+
+from frexp.util import fingerprint, file_digest
 
 
 class Task:
     
-    """Individual steps of a workflow."""
+    """Individual steps of a workflow.
+    
+    A task may declare the files it reads (inputs) and writes
+    (outputs), so that the workflow can skip it when it is up to
+    date. See Workflow.skip_fresh.
+    """
+    
+    workflow_attrs = ()
+    """Names of workflow attributes that affect this task's outputs,
+    included in its fingerprint.
+    """
     
     def __init__(self, workflow):
         self.workflow = workflow
         self.print = self.workflow.print
+        self.emit = self.workflow.emit
         self.prefix = self.workflow.prefix
     
     def run(self):
@@ -29,6 +45,44 @@ class Task:
         """Remote generated files."""
         pass
     
+    @property
+    def inputs(self):
+        """List of files read by this task."""
+        return []
+    
+    @property
+    def outputs(self):
+        """List of files written by this task. A task with no outputs
+        is never considered up to date.
+        """
+        return []
+    
+    def get_fingerprint(self):
+        """Return a digest of this task's class (its code and class
+        attributes) and of the workflow attributes it depends on.
+        Changing any of these makes the task out of date.
+        """
+        return fingerprint(type(self), *(getattr(self.workflow, attr)
+                                         for attr in self.workflow_attrs))
+    
+    def get_stamp(self, freshness='hash'):
+        """Return a record of the task's fingerprint and the current
+        state of its inputs, or None if some input does not exist.
+        Inputs are summarized by content digest if freshness is 'hash',
+        or by modification time if it is 'mtime'.
+        """
+        assert freshness in ['hash', 'mtime']
+        files = {}
+        for fn in self.inputs:
+            try:
+                if freshness == 'hash':
+                    files[fn] = file_digest(fn)
+                else:
+                    files[fn] = os.stat(fn).st_mtime_ns
+            except FileNotFoundError:
+                return None
+        return (self.get_fingerprint(), files)
+    
     def remove_file(self, filepath):
         """If filepath exists, delete it and print a message.
         Otherwise, ignore. filepath may also point to an empty
@@ -53,6 +107,23 @@ class Workflow:
     Can be overridden in constructor.
     """
     
+    skip_fresh = False
+    """If True, run() skips tasks that are up to date: their outputs
+    exist, and neither their fingerprint nor their inputs changed
+    since they last ran. A change therefore only re-runs the tasks
+    downstream of it.
+    """
+    
+    flush_output = True
+    """Whether print() flushes its stream by default. Set False for
+    long unattended runs, where event sinks report progress instead.
+    """
+    
+    freshness = 'hash'
+    """How to detect changed inputs: 'hash' to compare contents, or
+    'mtime' to compare modification times (cheaper for large files).
+    """
+    
     def __init__(self, prefix=None, fout=sys.stdout):
         if prefix is not None:
             self.prefix = prefix
@@ -62,19 +133,97 @@ class Workflow:
         
         self.tasks = []
         """Task instances."""
+        
+        self.event_sinks = []
+        """Functions to call with each progress event. See events.py."""
+        self._emit_lock = threading.Lock()
     
-    def print(self, *args, file=None, flush=True, **kargs):
-        """Print, defaulting to stream self.fout with flushing."""
+    def print(self, *args, file=None, flush=None, **kargs):
+        """Print, defaulting to stream self.fout, flushing if
+        self.flush_output is set.
+        """
         if file is None:
             file = self.fout
-        builtins.print(*args, file=file, flush=True, **kargs)
+        if flush is None:
+            flush = self.flush_output
+        builtins.print(*args, file=file, flush=flush, **kargs)
     
-    def run(self):
-        """Run the whole workflow."""
-        for task in self.tasks:
+    def emit(self, event, **fields):
+        """Send a progress event to all event sinks. May be called from
+        several threads; sinks are called from one at a time.
+        """
+        if len(self.event_sinks) == 0:
+            return
+        ev = {'event': event, 'time': time.time(), 'prefix': self.prefix}
+        ev.update(fields)
+        with self._emit_lock:
+            for sink in self.event_sinks:
+                sink(ev)
+    
+    def close_event_sinks(self):
+        """Close those event sinks that have a close() method, writing
+        out any buffered events.
+        """
+        for sink in self.event_sinks:
+            close = getattr(sink, 'close', None)
+            if close is not None:
+                close()
+    
+    @property
+    def stamps_filename(self):
+        """Filename recording the state of each task's inputs when it
+        last ran.
+        """
+        return self.prefix + '_stamps.pickle'
+    
+    def load_stamps(self):
+        try:
+            with open(self.stamps_filename, 'rb') as in_file:
+                return pickle.load(in_file)
+        except FileNotFoundError:
+            return {}
+    
+    def save_stamps(self, stamps):
+        with open(self.stamps_filename, 'wb') as out_file:
+            pickle.dump(stamps, out_file)
+    
+    def is_fresh(self, task, stamp, old_stamp):
+        return (stamp is not None and stamp == old_stamp and
+                len(task.outputs) > 0 and
+                all(os.path.exists(fn) for fn in task.outputs))
+    
+    def run(self, force=False):
+        """Run the whole workflow. If skip_fresh is set, skip tasks
+        that are up to date, unless force is True.
+        """
+        if not self.skip_fresh:
+            for task in self.tasks:
+                task.run()
+            return
+        
+        stamps = self.load_stamps()
+        for i, task in enumerate(self.tasks):
+            key = '{}:{}'.format(i, type(task).__name__)
+            stamp = task.get_stamp(self.freshness)
+            if not force and self.is_fresh(task, stamp, stamps.get(key)):
+                self.print('Skipping {} (up to date)'.format(
+                           type(task).__name__))
+                continue
+            # Forget the old stamp first, so that the task is
+            # re-run if it is interrupted.
+            if stamps.pop(key, None) is not None:
+                self.save_stamps(stamps)
             task.run()
+            stamps[key] = stamp
+            self.save_stamps(stamps)
     
     def cleanup(self):
         """Delete files generated by the workflow."""
         for task in self.tasks:
             task.cleanup()
+        if self.prefix is not None:
+            try:
+                os.remove(self.stamps_filename)
+                self.print('Removed ' + self.stamps_filename)
+            except FileNotFoundError:
+                pass
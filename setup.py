@@ -11,4 +11,7 @@ setup(
     description='A library for running benchmark experiments',
     
     packages=['frexp', 'frexp.plot'],
+    entry_points={
+        'console_scripts': ['frexp = frexp.cli:main'],
+    },
 )